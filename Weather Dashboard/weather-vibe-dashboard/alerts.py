@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import timedelta
+
+from conditions import Condition, classify
+from metrics import increment
+
+# ============================================
+# ALERT RULES
+# ============================================
+# Each rule keeps a small, fixed-shape state per city and looks only at the
+# newest observation, so evaluation cost does not grow with history size.
+Alert = namedtuple("Alert", "rule city timestamp message")
+
+# Fired alerts kept for the dashboard, newest last
+MAX_RECENT_ALERTS = 200
+# Upper bound on samples a windowed rule remembers per city (3h at 10-minute polls is 18)
+MAX_WINDOW_SAMPLES = 64
+# Stored history replayed into a city's rules before its first live observation
+PRIME_WINDOW = timedelta(hours=3)
+
+class TemperatureDrop:
+    """Temperature at least `drop` °C below its highest value within `window`."""
+
+    def __init__(self, drop=8.0, window=timedelta(hours=3)):
+        self.drop = drop
+        self.window = window.total_seconds()
+        self.name = f"temperature_drop_{drop:g}c_{window / timedelta(hours=1):g}h"
+
+    def initial_state(self):
+        # [(timestamp, temperature) with decreasing temperatures, currently firing]
+        return [deque(maxlen=MAX_WINDOW_SAMPLES), False]
+
+    def update(self, state, timestamp, temperature, humidity, condition):
+        peaks = state[0]
+        # Monotonic queue: the front is always the window maximum
+        while peaks and peaks[0][0] < timestamp - self.window:
+            peaks.popleft()
+        while peaks and peaks[-1][1] <= temperature:
+            peaks.pop()
+        peaks.append((timestamp, temperature))
+        fall = peaks[0][1] - temperature
+        triggered = fall >= self.drop
+        fired = triggered and not state[1]
+        state[1] = triggered
+        if fired:
+            hours = self.window / 3600
+            return f"Temperature fell {fall:.1f}°C within {hours:g}h, now {temperature:.1f}°C"
+        return None
+
+class SustainedHumidity:
+    """Humidity above `threshold` % for `samples` consecutive observations."""
+
+    def __init__(self, threshold=90, samples=2):
+        self.threshold = threshold
+        self.samples = samples
+        self.name = f"humidity_above_{threshold:g}_x{samples}"
+
+    def initial_state(self):
+        # [consecutive observations above the threshold]
+        return [0]
+
+    def update(self, state, timestamp, temperature, humidity, condition):
+        state[0] = state[0] + 1 if humidity > self.threshold else 0
+        if state[0] == self.samples:
+            return f"Humidity above {self.threshold:g}% for {self.samples} observations, now {humidity:.0f}%"
+        return None
+
+class ConditionBecomes:
+    """Condition changes to `target` (including the first observation of a city)."""
+
+    def __init__(self, target=Condition.THUNDERSTORM):
+        self.target = classify(target)
+        self.name = f"condition_{self.target.value.lower()}"
+
+    def initial_state(self):
+        # [previous condition]
+        return [None]
+
+    def update(self, state, timestamp, temperature, humidity, condition):
+        previous, state[0] = state[0], condition
+        if condition is self.target and previous is not self.target:
+            return f"Condition changed to {self.target.value}"
+        return None
+
+DEFAULT_RULES = [
+    TemperatureDrop(drop=8.0, window=timedelta(hours=3)),
+    SustainedHumidity(threshold=90, samples=2),
+    ConditionBecomes(Condition.THUNDERSTORM),
+]
+
+# ============================================
+# ALERT ENGINE
+# ============================================
+class AlertEngine:
+    """Evaluates every rule against each new observation as it is recorded.
+
+    State is per (city, rule) and constant in size. An observation that is
+    not newer than the city's last one is ignored, so sessions feeding the
+    same cached payload evaluate it once. After a restart, prime_from_store()
+    rebuilds each city's state from its stored observations, so conditions
+    that were already current are not announced again.
+    """
+
+    def __init__(self, rules=None, max_recent=MAX_RECENT_ALERTS):
+        self.rules = list(rules or DEFAULT_RULES)
+        self._cities = {}
+        self._recent = deque(maxlen=max_recent)
+        self._lock = threading.Lock()
+
+    def observe(self, city, timestamp, temperature, humidity, condition):
+        """Evaluate one observation (timestamp in epoch seconds); returns the alerts it fired."""
+        condition = classify(condition)
+        fired = []
+        with self._lock:
+            entry = self._cities.get(city)
+            if entry is None:
+                entry = self._cities[city] = self._new_entry()
+            if entry[0] is not None and timestamp <= entry[0]:
+                return fired
+            entry[0] = timestamp
+            for rule, state in zip(self.rules, entry[1]):
+                message = rule.update(state, timestamp, temperature, humidity, condition)
+                if message:
+                    fired.append(Alert(rule.name, city, timestamp, message))
+            self._recent.extend(fired)
+        if fired:
+            increment("alerts_fired", len(fired))
+        return fired
+
+    def _new_entry(self):
+        return [None, [rule.initial_state() for rule in self.rules]]
+
+    def prime(self, city, history):
+        """Replay a city's stored observations into its rule state without firing.
+
+        `history` is a history-shaped frame (timestamp, temperature_c,
+        humidity, condition); rows within PRIME_WINDOW of its newest are
+        used. Cities that already have state are left alone. Returns the
+        number of rows replayed.
+        """
+        rows = []
+        if history is not None and not history.empty:
+            history = history.dropna(subset=['timestamp', 'temperature_c', 'humidity']).sort_values('timestamp')
+            if not history.empty:
+                history = history[history['timestamp'] >= history['timestamp'].iloc[-1] - PRIME_WINDOW]
+                # Stored times are local, as written by records_from_weather_data()
+                rows = list(zip(
+                    (timestamp.to_pydatetime().timestamp() for timestamp in history['timestamp']),
+                    history['temperature_c'], history['humidity'], map(classify, history['condition'])
+                ))[-MAX_WINDOW_SAMPLES:]
+        with self._lock:
+            if city in self._cities:
+                return 0
+            entry = self._cities[city] = self._new_entry()
+            for timestamp, temperature, humidity, condition in rows:
+                if entry[0] is not None and timestamp <= entry[0]:
+                    continue
+                entry[0] = timestamp
+                for rule, state in zip(self.rules, entry[1]):
+                    rule.update(state, timestamp, temperature, humidity, condition)
+        return len(rows)
+
+    def prime_from_store(self, store, cities, hot=None):
+        """Prime every city without state from the history store (or the hot tier).
+
+        Call before recording a refresh, so observations evaluated before a
+        restart are replayed rather than fired again. Cheap once a city is known.
+        """
+        primed = 0
+        for city in cities:
+            with self._lock:
+                if city in self._cities:
+                    continue
+            history = hot.latest(city, MAX_WINDOW_SAMPLES) if hot is not None else None
+            if history is None:
+                history = store.latest_n(city, MAX_WINDOW_SAMPLES)
+            primed += self.prime(city, history)
+        return primed
+
+    def observe_weather_data(self, weather_data):
+        """Evaluate a {city: payload} refresh; returns the alerts it fired."""
+        now = time.time()
+        fired = []
+        for city, data in weather_data.items():
+            weather = data['weather'][0]
+            fired.extend(self.observe(
+                city, data.get('dt') or now, data['main']['temp'], data['main']['humidity'],
+                weather.get('id') or weather['main']
+            ))
+        return fired
+
+    def recent(self, cities=None, limit=None):
+        """Fired alerts, newest first, optionally only for `cities`."""
+        with self._lock:
+            alerts = list(self._recent)
+        if cities is not None:
+            wanted = set(cities)
+            alerts = [alert for alert in alerts if alert.city in wanted]
+        alerts.reverse()
+        return alerts[:limit] if limit else alerts
+
+    def clear(self):
+        with self._lock:
+            self._cities.clear()
+            self._recent.clear()
+
+alert_engine = AlertEngine()
@@ -1,13 +1,36 @@
-import streamlit as st
-import requests
-import pandas as pd
-import json
+import time
+_script_started = time.perf_counter()
+
 import os
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-import plotly.express as px
-from pathlib import Path
+from datetime import datetime
+import streamlit as st
+from lazy import lazy_import
+from weather_api import fetch_weather_cached, fetch_weather_batch, response_cache
+from history_store import open_history_store, record_observations, load_latest_snapshot
+from favorites import add_favorite_city, load_favorite_cities, remove_favorite_city
+from city_registry import city_registry, city_search, normalize_city
+from trends import TREND_WINDOWS, load_trend
+from history_export import EXPORT_FORMATS, MAX_EXPORT_BYTES, export_history
+from metrics import finish_render, record_span, registry, start_render, timed
+from render_cache import payload_fingerprint, render_cache
+from weather_frame import add_daily_deltas, build_weather_frame, in_unit
+from conditions import Condition, classify
+from forecast import fetch_forecast
+from hot_tier import hot_tier
+from alerts import alert_engine
+from history_stats import city_correlation, daily_matrix, get_daily_stats, rolling_anomalies
+from map_clusters import MAX_LEVEL, cluster_cities
+
+# Statistics tab: measures that can be compared, and how much of them is drawn
+STAT_FIELDS = {"🌡️ Temperature (°C)": "temperature_c", "💧 Humidity (%)": "humidity"}
+STATS_DAYS = 30
+STATS_MAX_CITIES = 25
+# Weather cards built per page of the Current Conditions tab
+CARDS_PER_PAGE = 9
+
+# pandas and plotly load on first use, after the header and sidebar have rendered
+pd = lazy_import("pandas")
+go = lazy_import("plotly.graph_objects")
 
 # ============================================
 # PAGE CONFIGURATION
@@ -24,6 +47,11 @@ st.set_page_config(
     }
 )
 
+# Per-render timing spans, shown in the Settings & Info tab. Module imports are
+# cached after the first run, so the "imports" span is only large on a cold start
+render_timings = start_render(started=_script_started)
+record_span("imports", time.perf_counter() - _script_started)
+
 # ============================================
 # CUSTOM STYLING
 # ============================================
@@ -70,116 +98,256 @@ if 'temp_unit' not in st.session_state:
     st.session_state.temp_unit = "C"
 if 'selected_cities' not in st.session_state:
     st.session_state.selected_cities = []
+if 'force_refresh' not in st.session_state:
+    st.session_state.force_refresh = False
+if 'show_raw_data' not in st.session_state:
+    st.session_state.show_raw_data = False
+if 'show_export' not in st.session_state:
+    st.session_state.show_export = False
 
 # ============================================
 # UTILITY FUNCTIONS
 # ============================================
 
-def load_favorite_cities():
-    """Load favorite cities from JSON file."""
-    if os.path.exists("favorite_cities.json"):
-        try:
-            with open("favorite_cities.json", "r") as f:
-                data = json.load(f)
-                return data.get("cities", [])
-        except:
-            return []
-    return []
-
-def save_favorite_cities(cities):
-    """Save favorite cities to JSON file."""
-    with open("favorite_cities.json", "w") as f:
-        json.dump({"cities": list(set(cities))}, f, indent=2)
-
-def load_weather_history():
-    """Load weather history from CSV."""
-    if os.path.exists("weather_history.csv"):
-        try:
-            return pd.read_csv("weather_history.csv")
-        except:
-            return pd.DataFrame()
-    return pd.DataFrame()
-
-def save_weather_data(city, temp_c, humidity, condition):
-    """Append weather data to CSV history."""
-    history = load_weather_history()
-    new_record = pd.DataFrame({
-        'timestamp': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-        'city': [city],
-        'temperature_c': [temp_c],
-        'humidity': [humidity],
-        'condition': [condition]
-    })
-    history = pd.concat([history, new_record], ignore_index=True)
-    history.to_csv("weather_history.csv", index=False)
-
-def fetch_weather(api_key, city):
-    """Fetch weather data from OpenWeatherMap API."""
-    try:
-        url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={api_key}&units=metric"
-        response = requests.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.ConnectionError:
-        st.error("❌ Network error: Unable to connect to OpenWeatherMap API")
-        return None
-    except requests.exceptions.HTTPError as e:
-        if response.status_code == 401:
-            st.error("❌ Invalid API Key")
-        elif response.status_code == 404:
-            st.error(f"❌ City '{city}' not found")
-        else:
-            st.error(f"❌ API Error: {response.status_code}")
-        return None
-    except Exception as e:
-        st.error(f"❌ Error: {str(e)}")
-        return None
+WEATHER_EMOJIS = {
+    Condition.CLEAR: '☀️',
+    Condition.CLOUDS: '☁️',
+    Condition.RAIN: '🌧️',
+    Condition.DRIZZLE: '🌦️',
+    Condition.THUNDERSTORM: '⛈️',
+    Condition.SNOW: '❄️',
+    Condition.MIST: '🌫️',
+    Condition.SMOKE: '💨',
+    Condition.HAZE: '🌫️',
+    Condition.DUST: '🌪️',
+    Condition.FOG: '🌫️',
+    Condition.SAND: '🌪️',
+    Condition.ASH: '💨',
+    Condition.SQUALL: '💨',
+    Condition.TORNADO: '🌪️'
+}
 
-def get_weather_emoji(condition):
-    """Return emoji based on weather condition."""
-    condition_lower = condition.lower()
-    emoji_map = {
-        'clear': '☀️',
-        'clouds': '☁️',
-        'rain': '🌧️',
-        'drizzle': '🌦️',
-        'thunderstorm': '⛈️',
-        'snow': '❄️',
-        'mist': '🌫️',
-        'smoke': '💨',
-        'haze': '🌫️',
-        'dust': '🌪️',
-        'fog': '🌫️',
-        'sand': '🌪️',
-        'ash': '💨',
-        'squall': '💨',
-        'tornado': '🌪️'
-    }
-    for key, emoji in emoji_map.items():
-        if key in condition_lower:
-            return emoji
-    return '🌤️'
+CONDITION_COLORS = {
+    Condition.CLEAR: (255, 193, 7),        # Yellow
+    Condition.CLOUDS: (158, 158, 158),     # Gray
+    Condition.RAIN: (33, 150, 243),        # Blue
+    Condition.DRIZZLE: (100, 181, 246),    # Light Blue
+    Condition.THUNDERSTORM: (63, 81, 181), # Dark Blue
+    Condition.SNOW: (207, 216, 220),       # Light Gray
+    Condition.MIST: (176, 190, 197),       # Grayish
+}
+DEFAULT_CONDITION_COLOR = (156, 39, 176)  # Purple
 
-def celsius_to_fahrenheit(celsius):
-    """Convert Celsius to Fahrenheit."""
-    return (celsius * 9/5) + 32
+def get_weather_emoji(condition):
+    """Return emoji based on weather condition (name, description or OWM id)."""
+    return WEATHER_EMOJIS.get(classify(condition), '🌤️')
 
 def get_color_for_condition(condition):
-    """Return RGB color based on condition."""
-    condition_lower = condition.lower()
-    colors = {
-        'clear': (255, 193, 7),        # Yellow
-        'clouds': (158, 158, 158),     # Gray
-        'rain': (33, 150, 243),        # Blue
-        'drizzle': (100, 181, 246),    # Light Blue
-        'thunderstorm': (63, 81, 181), # Dark Blue
-        'snow': (207, 216, 220),       # Light Gray
-        'mist': (176, 190, 197),       # Grayish
-    }
-    for key, color in colors.items():
-        if key in condition_lower:
-            return color
-    return (156, 39, 176)  # Purple default
+    """Return RGB color based on condition (name, description or OWM id)."""
+    return CONDITION_COLORS.get(classify(condition), DEFAULT_CONDITION_COLOR)
+
+def build_weather_card(city, row, unit):
+    """Return the HTML for one live weather card from a row of the unit-projected weather frame."""
+    emoji = get_weather_emoji(row['condition_group'])
+    delta = row['temp_delta_24h']
+    display_delta = "" if pd.isna(delta) else f"<div style='font-size: 0.9em; opacity: 0.8;'>{'▲' if delta >= 0 else '▼'} {abs(delta):.1f}°{unit} vs 24h ago</div>"
+    
+    return f"""
+    <div style='
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        padding: 20px;
+        border-radius: 10px;
+        color: white;
+        text-align: center;
+    '>
+        <h2>{emoji} {city}</h2>
+        <div style='font-size: 2.5em; font-weight: bold; margin: 15px 0;'>{row['temperature']:.1f}°{unit}</div>
+        <div style='font-size: 1em; opacity: 0.9;'>Feels like {row['feels_like']:.1f}°{unit}</div>
+        {display_delta}
+        <div style='font-size: 1.1em; margin-top: 10px;'>{row['condition']}</div>
+        <hr style='opacity: 0.3; margin: 15px 0;'>
+        <div style='display: grid; grid-template-columns: 1fr 1fr; gap: 10px; font-size: 0.9em;'>
+            <div>💧 {row['humidity']:.0f}%</div>
+            <div>💨 {row['wind_speed']:g} m/s</div>
+            <div>🔽 {row['pressure']:.0f} hPa</div>
+            <div>🌫️ Dew {row['dew_point']:.1f}°{unit}</div>
+        </div>
+    </div>
+    """
+
+def build_temperature_chart(temps, unit):
+    """Bar chart of current temperatures; temps is a city-indexed Series already in `unit`."""
+    fig = go.Figure(data=[
+        go.Bar(
+            x=temps.index,
+            y=temps.values,
+            marker=dict(
+                color=temps.values,
+                colorscale='RdYlBu_r',
+                showscale=True
+            ),
+            text=[f"{t:.1f}°" for t in temps.values],
+            textposition='auto',
+        )
+    ])
+    fig.update_layout(
+        title="Temperature by City",
+        xaxis_title="City",
+        yaxis_title=f"Temperature (°{unit})",
+        hovermode='x unified',
+        height=400
+    )
+    return fig
+
+def build_humidity_chart(humidity):
+    """Bar chart of current humidity; humidity is a city-indexed Series."""
+    fig = go.Figure(data=[
+        go.Bar(
+            x=humidity.index,
+            y=humidity.values,
+            marker=dict(color='#4ECDC4'),
+            text=[f"{h:.0f}%" for h in humidity.values],
+            textposition='auto',
+        )
+    ])
+    fig.update_layout(
+        title="Humidity by City",
+        xaxis_title="City",
+        yaxis_title="Humidity (%)",
+        hovermode='x unified',
+        height=400
+    )
+    return fig
+
+def build_city_day_heatmap(matrix, title, colorbar_title):
+    """City x day heatmap of a wide (day x city) frame of daily values."""
+    fig = go.Figure(data=go.Heatmap(
+        z=matrix.T.to_numpy(),
+        x=matrix.index,
+        y=list(matrix.columns),
+        colorscale='RdYlBu_r',
+        colorbar=dict(title=colorbar_title),
+        hoverongaps=False
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Day",
+        height=max(300, 28 * len(matrix.columns) + 120),
+        template='plotly_white'
+    )
+    return fig
+
+def build_correlation_heatmap(correlation, title):
+    """Symmetric heatmap of a city x city correlation matrix."""
+    fig = go.Figure(data=go.Heatmap(
+        z=correlation.to_numpy(),
+        x=list(correlation.columns),
+        y=list(correlation.index),
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu',
+        text=correlation.round(2).to_numpy(),
+        texttemplate="%{text}",
+        hoverongaps=False
+    ))
+    fig.update_layout(
+        title=title,
+        height=max(300, 36 * len(correlation.columns) + 120),
+        template='plotly_white'
+    )
+    return fig
+
+def build_city_map(clusters, unit, title, fit=False):
+    """Map of city clusters coloured by condition; bigger markers hold more cities."""
+    hover = [
+        f"<b>{label}</b><br>{get_weather_emoji(condition)} {condition} · {temperature:.1f}°{unit}"
+        + (f"<br>{count} cities (mean temperature)" if count > 1 else "")
+        for label, condition, temperature, count in zip(
+            clusters['label'], clusters['condition'], clusters['temperature'], clusters['count']
+        )
+    ]
+    fig = go.Figure(go.Scattergeo(
+        lat=clusters['lat'],
+        lon=clusters['lon'],
+        mode='markers+text',
+        text=[str(count) if count > 1 else "" for count in clusters['count']],
+        textfont=dict(color='white', size=11),
+        hovertext=hover,
+        hoverinfo='text',
+        marker=dict(
+            size=(clusters['count'] ** 0.5 * 8 + 8).clip(upper=48),
+            color=['rgb' + str(get_color_for_condition(condition)) for condition in clusters['condition']],
+            line=dict(width=1, color='white'),
+            opacity=0.9
+        )
+    ))
+    fig.update_geos(
+        projection_type='natural earth',
+        showcountries=True,
+        countrycolor='#cccccc',
+        showland=True,
+        landcolor='#f5f5f5',
+        fitbounds='locations' if fit else False
+    )
+    fig.update_layout(title=title, height=520, margin=dict(l=0, r=0, t=40, b=0))
+    return fig
+
+def build_trend_figure(trend, is_rollup, field, name, color, title, yaxis_title, fill=None, forecast=None):
+    """Build a trend line; rollups get a shaded min/max band around the mean.
+
+    When forecast rows are given they continue the line as a dashed trace.
+    Returns None when there is nothing to plot.
+    """
+    if trend.empty and (forecast is None or forecast.empty):
+        return None
+    fig = go.Figure()
+    if is_rollup:
+        fig.add_trace(go.Scatter(
+            x=trend.index, y=trend[f"{field}_max"],
+            mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=trend.index, y=trend[f"{field}_min"],
+            mode='lines', line=dict(width=0), fill='tonexty',
+            fillcolor='rgba(0, 0, 0, 0.08)', name='Min / Max'
+        ))
+        y = trend[f"{field}_mean"]
+    else:
+        y = trend[field]
+    
+    marker = dict(size=8)
+    if not is_rollup and 'condition_group' in trend:
+        # Categorical map: one colour lookup per distinct condition, not per point
+        marker['color'] = trend['condition_group'].map(
+            {condition.value: 'rgb' + str(get_color_for_condition(condition)) for condition in Condition}
+        ).astype(str)
+    
+    fig.add_trace(go.Scatter(
+        x=trend.index,
+        y=y,
+        mode='lines+markers' if len(trend) <= 50 else 'lines',
+        name=name,
+        line=dict(color=color, width=3),
+        marker=marker,
+        fill=None if is_rollup else fill
+    ))
+    if forecast is not None and not forecast.empty:
+        fig.add_trace(go.Scatter(
+            x=forecast['valid_at'],
+            y=forecast[field],
+            mode='lines',
+            name=f"{name} forecast",
+            line=dict(color=color, width=2, dash='dash')
+        ))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Date",
+        yaxis_title=yaxis_title,
+        hovermode='x unified',
+        height=400,
+        template='plotly_white'
+    )
+    return fig
 
 # ============================================
 # SIDEBAR - CONTROLS
@@ -198,7 +366,7 @@ st.session_state.api_key = api_key
 # Temperature Unit Toggle
 st.sidebar.markdown("### 🌡️ Temperature Unit")
 temp_unit = st.sidebar.radio("Select unit:", ["°C", "°F"], horizontal=True)
-st.session_state.temp_unit = temp_unit[0]
+st.session_state.temp_unit = temp_unit[-1]
 
 # Load and display favorite cities
 favorite_cities = load_favorite_cities()
@@ -210,11 +378,32 @@ new_city = st.sidebar.text_input(
     "Add a new city",
     placeholder="e.g., New York"
 )
+# Suggestions come from the bundled city list and every city resolved so far
+city_search.add(city_registry.records())
+suggestions = city_search.search(new_city) if new_city else []
+if suggestions:
+    typed = [] if normalize_city(new_city) in map(normalize_city, suggestions) else [new_city.strip()]
+    # Prefix matches are offered first; fuzzy ones only as alternatives to what was typed
+    prefix_match = normalize_city(suggestions[0]).startswith(normalize_city(new_city))
+    new_city = st.sidebar.selectbox(
+        "Did you mean:",
+        options=suggestions + typed if prefix_match else typed + suggestions
+    )
 if st.sidebar.button("➕ Add City"):
-    if new_city and new_city not in favorite_cities:
-        favorite_cities.append(new_city)
-        save_favorite_cities(favorite_cities)
-        st.sidebar.success(f"✅ Added {new_city}")
+    city = new_city.strip() if new_city else ""
+    if city and api_key:
+        # Resolve the name once; the favorite is stored under its canonical spelling
+        data, error = fetch_weather_cached(api_key, city)
+        if error:
+            st.sidebar.error(error)
+            city = ""
+        else:
+            record = city_registry.remember(city, data)
+            city_registry.flush()
+            city = city_registry.canonical_name(record) if record else city
+    if city and city not in favorite_cities:
+        favorite_cities = add_favorite_city(city)
+        st.sidebar.success(f"✅ Added {city}")
         st.rerun()
 
 # Select cities to display
@@ -234,8 +423,7 @@ city_to_remove = st.sidebar.selectbox(
 )
 if st.sidebar.button("🗑️ Remove City"):
     if city_to_remove in favorite_cities:
-        favorite_cities.remove(city_to_remove)
-        save_favorite_cities(favorite_cities)
+        favorite_cities = remove_favorite_city(city_to_remove)
         st.sidebar.success(f"✅ Removed {city_to_remove}")
         st.rerun()
 
@@ -249,10 +437,16 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Latest conditions recorded by collector.py, when it is running
+snapshot = load_latest_snapshot()
+
+# Opened after the header and sidebar so the first paint doesn't wait on pandas
+history_store = open_history_store()
+
 # ============================================
 # ERROR HANDLING
 # ============================================
-if not api_key:
+if not api_key and not snapshot:
     st.warning("⚠️ Please enter your OpenWeatherMap API key in the sidebar to get started!")
     st.info("Get your free API key at: https://openweathermap.org/api")
 elif not selected_cities:
@@ -265,6 +459,7 @@ else:
     
     with col2:
         if st.button("🔄 Refresh Weather Data", use_container_width=True):
+            st.session_state.force_refresh = True
             st.rerun()
     
     with col3:
@@ -274,22 +469,59 @@ else:
     # ============================================
     # FETCH WEATHER DATA
     # ============================================
-    weather_data = {}
-    for city in selected_cities:
-        data = fetch_weather(api_key, city)
-        if data:
-            weather_data[city] = data
-            # Save to history
-            temp_c = data['main']['temp']
-            humidity = data['main']['humidity']
-            condition = data['weather'][0]['main']
-            save_weather_data(city, temp_c, humidity, condition)
+    # Cities the collector has already stored are read from the snapshot;
+    # only the rest are fetched inline
+    weather_data = {city: snapshot[city] for city in selected_cities if city in snapshot}
+    missing_cities = [city for city in selected_cities if city not in weather_data]
+    
+    # Cached responses are reused unless the user explicitly asked for a refresh
+    use_cache = not st.session_state.force_refresh
+    st.session_state.force_refresh = False
+    
+    # Recent samples per city are held in memory; only rows stored since the
+    # last render (by this or another process) are read from the store
+    with timed("hot_tier_sync"):
+        hot_tier.sync(history_store)
+    
+    # Alert state of cities not seen since startup is rebuilt from what was
+    # stored before this refresh, so a restart does not re-announce alerts
+    with timed("alerts_prime"):
+        alert_engine.prime_from_store(history_store, selected_cities, hot=hot_tier)
+    
+    if missing_cities and api_key:
+        with timed("fetch"):
+            fetched_data, fetch_errors = fetch_weather_batch(api_key, missing_cities, use_cache=use_cache)
+        for city, error in fetch_errors.items():
+            st.error(error)
+        
+        # Save to history - one append for the whole refresh, skipping
+        # observations another session has already recorded
+        with timed("history_append"):
+            record_observations(history_store, fetched_data)
+            hot_tier.record(fetched_data)
+        weather_data.update(fetched_data)
+        weather_data = {city: weather_data[city] for city in selected_cities if city in weather_data}
+    elif missing_cities:
+        st.info(f"⏳ Waiting for the collector to fetch: {', '.join(missing_cities)}")
+    
+    # Alert rules keep a little state per city and only look at new observations;
+    # payloads already evaluated (by this or another session) are skipped
+    with timed("alerts"):
+        alert_engine.observe_weather_data(weather_data)
+    alerts = alert_engine.recent(cities=selected_cities, limit=10)
+    if alerts:
+        with st.expander(f"🚨 Weather Alerts ({len(alerts)})", expanded=True):
+            for alert in alerts:
+                fired_at = datetime.fromtimestamp(alert.timestamp).strftime('%b %d, %H:%M')
+                st.warning(f"**{alert.city}** · {fired_at} · {alert.message}")
     
     if weather_data:
         # ============================================
         # TAB LAYOUT
         # ============================================
-        tab1, tab2, tab3 = st.tabs(["🌡️ Current Conditions", "📈 7-Day Trends", "⚙️ Settings & Info"])
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
+            "🌡️ Current Conditions", "🗺️ Map", "📈 7-Day Trends", "📊 Statistics", "⚙️ Settings & Info"
+        ])
         
         # ============================================
         # TAB 1: CURRENT CONDITIONS
@@ -297,187 +529,221 @@ else:
         with tab1:
             st.subheader("Live Weather Cards")
             
+            unit = st.session_state.temp_unit
+            fingerprints = tuple((city, payload_fingerprint(data)) for city, data in weather_data.items())
+            history_generation = history_store.generation()
+            
+            def build_current_frame():
+                # One columnar frame per refresh; derived metrics and daily deltas
+                # are computed for every city at once
+                with timed("history_load"):
+                    since = datetime.now() - pd.Timedelta(days=2)
+                    recent = [chunk for chunk in history_store.iter_chunks(start=since) if not chunk.empty]
+                history = pd.concat(recent, ignore_index=True) if recent else pd.DataFrame()
+                return add_daily_deltas(build_weather_frame(weather_data), history)
+            
+            with timed("weather_frame"):
+                current = render_cache.get_or_build(
+                    ("weather_frame", fingerprints, history_generation), build_current_frame
+                )
+                # Unit switches only re-project the cached °C columns
+                display = render_cache.get_or_build(
+                    ("weather_frame", fingerprints, history_generation, unit),
+                    lambda: in_unit(current, unit)
+                )
+            
+            # Only the visible page of cards is built and sent to the browser
+            card_cities = list(weather_data)
+            page_count = -(-len(card_cities) // CARDS_PER_PAGE)
+            card_page = 1
+            if page_count > 1:
+                card_page = st.number_input(
+                    f"Page (1–{page_count}):", min_value=1, max_value=page_count, value=1, step=1
+                )
+                first = (card_page - 1) * CARDS_PER_PAGE
+                st.caption(f"Showing cities {first + 1}–{min(first + CARDS_PER_PAGE, len(card_cities))} of {len(card_cities)}")
+            visible_cities = card_cities[(card_page - 1) * CARDS_PER_PAGE:card_page * CARDS_PER_PAGE]
+            
             # Create columns for weather cards
-            cols = st.columns(min(len(weather_data), 3))
+            cols = st.columns(min(len(visible_cities), 3))
             
-            for idx, (city, data) in enumerate(weather_data.items()):
+            # Cards and figures are memoised on their inputs, so a rerun with the
+            # same data (or a unit toggle seen before) reuses what was built last time
+            for idx, city in enumerate(visible_cities):
                 col = cols[idx % len(cols)]
+                data = weather_data[city]
                 
                 with col:
-                    temp_c = data['main']['temp']
-                    temp_f = celsius_to_fahrenheit(temp_c)
-                    humidity = data['main']['humidity']
-                    condition = data['weather'][0]['main']
-                    emoji = get_weather_emoji(condition)
-                    feels_like_c = data['main']['feels_like']
-                    feels_like_f = celsius_to_fahrenheit(feels_like_c)
-                    wind_speed = data['wind']['speed']
-                    pressure = data['main']['pressure']
-                    
-                    # Display temperature based on unit selection
-                    if st.session_state.temp_unit == 'F':
-                        display_temp = f"{temp_f:.1f}°F"
-                        display_feels = f"{feels_like_f:.1f}°F"
-                    else:
-                        display_temp = f"{temp_c:.1f}°C"
-                        display_feels = f"{feels_like_c:.1f}°C"
-                    
-                    st.markdown(f"""
-                    <div style='
-                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                        padding: 20px;
-                        border-radius: 10px;
-                        color: white;
-                        text-align: center;
-                    '>
-                        <h2>{emoji} {city}</h2>
-                        <div style='font-size: 2.5em; font-weight: bold; margin: 15px 0;'>{display_temp}</div>
-                        <div style='font-size: 1em; opacity: 0.9;'>Feels like {display_feels}</div>
-                        <div style='font-size: 1.1em; margin-top: 10px;'>{condition}</div>
-                        <hr style='opacity: 0.3; margin: 15px 0;'>
-                        <div style='display: grid; grid-template-columns: 1fr 1fr; gap: 10px; font-size: 0.9em;'>
-                            <div>💧 {humidity}%</div>
-                            <div>💨 {wind_speed} m/s</div>
-                            <div>🔽 {pressure} hPa</div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                    card_html = render_cache.get_or_build(
+                        ("card", city, payload_fingerprint(data), history_generation, unit),
+                        lambda: build_weather_card(city, display.loc[city], unit)
+                    )
+                    st.markdown(card_html, unsafe_allow_html=True)
             
             # Temperature comparison chart
             st.markdown("---")
             st.subheader("🌡️ Temperature Comparison")
             
-            temp_data = []
-            for city, data in weather_data.items():
-                temp_c = data['main']['temp']
-                temp_f = celsius_to_fahrenheit(temp_c)
-                if st.session_state.temp_unit == 'F':
-                    temp_data.append({"City": city, "Temperature": temp_f})
-                else:
-                    temp_data.append({"City": city, "Temperature": temp_c})
-            
-            df_temp = pd.DataFrame(temp_data)
-            
-            fig_temp = go.Figure(data=[
-                go.Bar(
-                    x=df_temp['City'],
-                    y=df_temp['Temperature'],
-                    marker=dict(
-                        color=df_temp['Temperature'],
-                        colorscale='RdYlBu_r',
-                        showscale=True
-                    ),
-                    text=[f"{t:.1f}°" for t in df_temp['Temperature']],
-                    textposition='auto',
+            with timed("figure:temperature_comparison"):
+                fig_temp = render_cache.get_or_build(
+                    ("temperature_chart", fingerprints, history_generation, unit),
+                    lambda: build_temperature_chart(display['temperature'], unit)
                 )
-            ])
-            fig_temp.update_layout(
-                title="Temperature by City",
-                xaxis_title="City",
-                yaxis_title=f"Temperature ({st.session_state.temp_unit})",
-                hovermode='x unified',
-                height=400
-            )
             st.plotly_chart(fig_temp, use_container_width=True)
             
             # Humidity comparison chart
             st.subheader("💧 Humidity Comparison")
             
-            humidity_data = []
-            for city, data in weather_data.items():
-                humidity_data.append({"City": city, "Humidity": data['main']['humidity']})
+            with timed("figure:humidity_comparison"):
+                fig_humidity = render_cache.get_or_build(
+                    ("humidity_chart", fingerprints),
+                    lambda: build_humidity_chart(display['humidity'])
+                )
+            st.plotly_chart(fig_humidity, use_container_width=True)
+        
+        # ============================================
+        # TAB 2: MAP
+        # ============================================
+        with tab2:
+            st.subheader("🗺️ City Map")
             
-            df_humidity = pd.DataFrame(humidity_data)
+            # Every tracked city with a payload: the ones on display plus the
+            # other favorites from the collector's snapshot
+            map_data = {city: snapshot[city] for city in favorite_cities if city in snapshot}
+            map_data.update(weather_data)
+            map_fingerprints = tuple((city, payload_fingerprint(data)) for city, data in map_data.items())
+            with timed("weather_frame"):
+                map_frame = render_cache.get_or_build(
+                    ("map_frame", map_fingerprints, unit),
+                    lambda: in_unit(build_weather_frame(map_data), unit)
+                )
             
-            fig_humidity = go.Figure(data=[
-                go.Bar(
-                    x=df_humidity['City'],
-                    y=df_humidity['Humidity'],
-                    marker=dict(color='#4ECDC4'),
-                    text=[f"{h}%" for h in df_humidity['Humidity']],
-                    textposition='auto',
+            # Cities are clustered on a grid here, so the browser gets a bounded
+            # number of markers; picking a cluster re-clusters just its region
+            map_detail = st.select_slider(
+                "🔍 Detail level:",
+                options=["Auto"] + list(range(MAX_LEVEL + 1)),
+                value="Auto",
+                help="Higher levels split cities into smaller clusters, up to the marker budget"
+            )
+            requested_level = None if map_detail == "Auto" else map_detail
+            with timed("map_clusters"):
+                clusters, map_level = render_cache.get_or_build(
+                    ("map_clusters", map_fingerprints, unit, requested_level),
+                    lambda: cluster_cities(map_frame, level=requested_level)
                 )
-            ])
-            fig_humidity.update_layout(
-                title="Humidity by City",
-                xaxis_title="City",
-                yaxis_title="Humidity (%)",
-                hovermode='x unified',
-                height=400
+            groups = clusters[clusters['count'] > 1]
+            map_focus = st.selectbox(
+                "🔎 Zoom into:",
+                options=[None] + list(groups.index),
+                format_func=lambda i: "🌍 All cities" if i is None else f"{groups.at[i, 'label']} ({groups.at[i, 'count']} cities)"
             )
-            st.plotly_chart(fig_humidity, use_container_width=True)
+            if map_focus is not None:
+                bounds = tuple(groups.loc[map_focus, ['lat_min', 'lat_max', 'lon_min', 'lon_max']])
+                with timed("map_clusters"):
+                    clusters, map_level = render_cache.get_or_build(
+                        ("map_clusters", map_fingerprints, unit, None, bounds),
+                        lambda: cluster_cities(map_frame, bounds=bounds)
+                    )
+            
+            if clusters.empty:
+                st.info("🗺️ None of the cities have coordinates yet.")
+            else:
+                with timed("figure:city_map"):
+                    fig_map = render_cache.get_or_build(
+                        ("city_map", map_fingerprints, unit, requested_level, map_focus),
+                        lambda: build_city_map(
+                            clusters, unit,
+                            title="Tracked cities" if map_focus is None else groups.at[map_focus, 'label'],
+                            fit=map_focus is not None
+                        )
+                    )
+                st.plotly_chart(fig_map, use_container_width=True)
+                st.caption(
+                    f"{int(clusters['count'].sum())} cities in {len(clusters)} markers "
+                    f"(detail level {map_level}); colours follow the current condition"
+                )
         
         # ============================================
-        # TAB 2: 7-DAY TRENDS
+        # TAB 3: 7-DAY TRENDS
         # ============================================
-        with tab2:
+        with tab3:
             st.subheader("📈 Historical Weather Trends")
             
-            history = load_weather_history()
+            with timed("history_load"):
+                history_cities = history_store.distinct_cities()
             
-            if not history.empty:
-                # Robustly parse both date and datetime formats, strip whitespace, coerce errors
-                history['timestamp'] = pd.to_datetime(history['timestamp'].astype(str).str.strip(), errors='coerce')
-                
+            if history_cities:
                 # Select city for trend
                 trend_city = st.selectbox(
                     "Select city to view trend:",
-                    options=history['city'].unique()
+                    options=history_cities
+                )
+                
+                trend_window = st.radio(
+                    "Trend window:",
+                    options=list(TREND_WINDOWS),
+                    horizontal=True
                 )
                 
-                city_history = history[history['city'] == trend_city].tail(7).copy()
+                with timed("history_load"):
+                    city_history = hot_tier.latest(trend_city, 7)
+                    if city_history is None:
+                        city_history = history_store.latest_n(trend_city, 7)
+                
+                # Forecast is fetched at most once per issue cycle per city, shared by all sessions
+                forecast = None
+                if api_key and st.checkbox("🔮 Show 5-day forecast", value=True):
+                    with timed("forecast"):
+                        forecast, forecast_error = fetch_forecast(api_key, trend_city)
+                    if forecast_error:
+                        st.caption(f"Forecast unavailable: {forecast_error}")
+                forecast_issue = forecast['issued_at'].iloc[0] if forecast is not None and not forecast.empty else None
+                
+                # Trend inputs only change when the store does, so key on its generation
+                trend_key = (trend_city, trend_window, history_store.generation())
+                
+                def load_city_trend():
+                    # Raw samples for short windows, precomputed min/mean/max rollups for long ones
+                    with timed("history_load"):
+                        return render_cache.get_or_build(
+                            ("trend_frame",) + trend_key,
+                            lambda: load_trend(history_store, trend_city, trend_window, hot=hot_tier)
+                        )
                 
                 if not city_history.empty:
                     # Temperature trend
-                    st.markdown("#### 🌡️ Temperature Trend (Last 7 Days)")
-                    
-                    fig_trend = go.Figure()
-                    
-                    fig_trend.add_trace(go.Scatter(
-                        x=city_history['timestamp'],
-                        y=city_history['temperature_c'],
-                        mode='lines+markers',
-                        name='Temperature',
-                        line=dict(color='#FF6B6B', width=3),
-                        marker=dict(size=8)
-                    ))
-                    
-                    fig_trend.update_layout(
-                        title=f"Temperature Trend for {trend_city}",
-                        xaxis_title="Date",
-                        yaxis_title="Temperature (°C)",
-                        hovermode='x unified',
-                        height=400,
-                        template='plotly_white'
-                    )
+                    st.markdown(f"#### 🌡️ Temperature Trend ({trend_window})")
                     
-                    st.plotly_chart(fig_trend, use_container_width=True)
+                    with timed("figure:temperature_trend"):
+                        fig_trend = render_cache.get_or_build(
+                            ("temperature_trend", forecast_issue) + trend_key,
+                            lambda: build_trend_figure(
+                                *load_city_trend(), 'temperature_c', 'Temperature', '#FF6B6B',
+                                title=f"Temperature Trend for {trend_city}",
+                                yaxis_title="Temperature (°C)",
+                                forecast=forecast
+                            )
+                        )
+                    if fig_trend is not None:
+                        st.plotly_chart(fig_trend, use_container_width=True)
                     
                     # Humidity trend
-                    st.markdown("#### 💧 Humidity Trend (Last 7 Days)")
-                    
-                    fig_humidity_trend = go.Figure()
+                    st.markdown(f"#### 💧 Humidity Trend ({trend_window})")
                     
-                    fig_humidity_trend.add_trace(go.Scatter(
-                        x=city_history['timestamp'],
-                        y=city_history['humidity'],
-                        mode='lines+markers',
-                        name='Humidity',
-                        line=dict(color='#4ECDC4', width=3),
-                        marker=dict(size=8),
-                        fill='tozeroy'
-                    ))
-                    
-                    fig_humidity_trend.update_layout(
-                        title=f"Humidity Trend for {trend_city}",
-                        xaxis_title="Date",
-                        yaxis_title="Humidity (%)",
-                        hovermode='x unified',
-                        height=400,
-                        template='plotly_white'
-                    )
-                    
-                    st.plotly_chart(fig_humidity_trend, use_container_width=True)
+                    with timed("figure:humidity_trend"):
+                        fig_humidity_trend = render_cache.get_or_build(
+                            ("humidity_trend", forecast_issue) + trend_key,
+                            lambda: build_trend_figure(
+                                *load_city_trend(), 'humidity', 'Humidity', '#4ECDC4',
+                                title=f"Humidity Trend for {trend_city}",
+                                yaxis_title="Humidity (%)",
+                                fill='tozeroy',
+                                forecast=forecast
+                            )
+                        )
+                    if fig_humidity_trend is not None:
+                        st.plotly_chart(fig_humidity_trend, use_container_width=True)
                     
                     # Data table
                     st.markdown("#### 📊 Historical Data")
@@ -497,9 +763,110 @@ else:
                 st.info("📊 No historical data available yet. Historical data will be collected over time.")
         
         # ============================================
-        # TAB 3: SETTINGS & INFO
+        # TAB 4: STATISTICS
         # ============================================
-        with tab3:
+        with tab4:
+            st.subheader("📊 Multi-City Statistics")
+            
+            # Daily rollups of the whole history (raw and compacted tiers) are kept
+            # up to date incrementally; every view below is cached per generation
+            stats_generation = history_store.generation()
+            with timed("history_load"):
+                daily = get_daily_stats(history_store)
+            
+            if not daily.empty:
+                stats_label = st.radio("Measure:", options=list(STAT_FIELDS), horizontal=True)
+                stats_field = STAT_FIELDS[stats_label]
+                daily_cities = sorted(daily['city'].unique())
+                stats_cities = st.multiselect(
+                    "Cities to compare:",
+                    options=daily_cities,
+                    default=[city for city in selected_cities if city in daily_cities][:STATS_MAX_CITIES],
+                    max_selections=STATS_MAX_CITIES
+                )
+                stats_key = (stats_field, tuple(stats_cities), stats_generation)
+                
+                if stats_cities:
+                    # Per-city daily min / mean / max
+                    st.markdown(f"#### 📅 Daily Summary (last {STATS_DAYS} days)")
+                    summary = render_cache.get_or_build(("stats_summary",) + stats_key, lambda: (
+                        daily[daily['city'].isin(stats_cities)
+                              & (daily['timestamp'] > daily['timestamp'].max() - pd.Timedelta(days=STATS_DAYS))]
+                        .sort_values(['timestamp', 'city'], ascending=[False, True])
+                        [['timestamp', 'city', f"{stats_field}_min", f"{stats_field}_mean", f"{stats_field}_max", 'samples']]
+                        .rename(columns={
+                            'timestamp': '📅 Day',
+                            'city': '🏙️ City',
+                            f"{stats_field}_min": '⬇️ Min',
+                            f"{stats_field}_mean": '➖ Mean',
+                            f"{stats_field}_max": '⬆️ Max',
+                            'samples': '🔢 Samples'
+                        })
+                        .round({'⬇️ Min': 1, '➖ Mean': 1, '⬆️ Max': 1})
+                    ))
+                    st.dataframe(summary, use_container_width=True, hide_index=True)
+                    
+                    matrix = render_cache.get_or_build(
+                        ("stats_matrix",) + stats_key,
+                        lambda: daily_matrix(daily, f"{stats_field}_mean", cities=stats_cities, days=STATS_DAYS)
+                    )
+                    
+                    # City x day heatmap
+                    st.markdown("#### 🗓️ Daily Mean by City")
+                    with timed("figure:stats_heatmap"):
+                        fig_heatmap = render_cache.get_or_build(
+                            ("stats_heatmap",) + stats_key,
+                            lambda: build_city_day_heatmap(matrix, f"Daily mean {stats_label}", stats_label.split(" ", 1)[1])
+                        )
+                    st.plotly_chart(fig_heatmap, use_container_width=True)
+                    
+                    # Correlation between cities
+                    st.markdown("#### 🔗 Correlation Between Cities")
+                    correlation = render_cache.get_or_build(
+                        ("stats_correlation",) + stats_key,
+                        lambda: city_correlation(daily_matrix(daily, f"{stats_field}_mean", cities=stats_cities))
+                    )
+                    if correlation.empty or correlation.notna().sum().sum() <= len(correlation):
+                        st.caption("Correlations appear once at least two cities share a few days of history.")
+                    else:
+                        with timed("figure:stats_correlation"):
+                            fig_correlation = render_cache.get_or_build(
+                                ("stats_correlation_figure",) + stats_key,
+                                lambda: build_correlation_heatmap(correlation, f"Correlation of daily mean {stats_label}")
+                            )
+                        st.plotly_chart(fig_correlation, use_container_width=True)
+                else:
+                    st.info("🏙️ Choose cities to compare.")
+                
+                # Anomalies are scored for every city at once, not just the ones compared
+                st.markdown("#### ⚠️ Anomalies (rolling z-score)")
+                with timed("stats:anomalies"):
+                    anomalies = render_cache.get_or_build(
+                        ("stats_anomalies", stats_field, stats_generation),
+                        lambda: rolling_anomalies(daily_matrix(daily, f"{stats_field}_mean"))
+                    )
+                if anomalies.empty:
+                    st.caption("No anomalous days: every daily mean is within the usual range for its city.")
+                else:
+                    recent_anomalies = anomalies.sort_values('timestamp', ascending=False, kind='stable').head(50)
+                    st.dataframe(
+                        recent_anomalies.rename(columns={
+                            'timestamp': '📅 Day',
+                            'city': '🏙️ City',
+                            'value': '📈 Daily Mean',
+                            'baseline': '📊 Usual',
+                            'zscore': '⚡ Z-Score'
+                        }).round({'📈 Daily Mean': 2, '📊 Usual': 2, '⚡ Z-Score': 2}),
+                        use_container_width=True,
+                        hide_index=True
+                    )
+            else:
+                st.info("📊 No historical data available yet. Historical data will be collected over time.")
+        
+        # ============================================
+        # TAB 5: SETTINGS & INFO
+        # ============================================
+        with tab5:
             st.subheader("ℹ️ About This App")
             
             col1, col2 = st.columns(2)
@@ -514,6 +881,10 @@ else:
                 
                 ✅ **Historical Trends** - 7-day temperature and humidity trends
                 
+                ✅ **Weather Alerts** - Sudden temperature drops, sustained humidity, thunderstorms
+                
+                ✅ **Statistics** - Daily summaries, anomalies and city correlations
+                
                 ✅ **Data Persistence** - Automatic saving to JSON and CSV
                 
                 ✅ **Beautiful UI** - Responsive design with emojis and colors
@@ -542,7 +913,7 @@ else:
                 - **Frontend**: Streamlit
                 - **API**: OpenWeatherMap
                 - **Data**: Pandas, CSV, JSON
-                - **Viz**: Plotly, Matplotlib
+                - **Viz**: Plotly
                 - **Language**: Python 3.8+
                 """)
             
@@ -560,12 +931,86 @@ else:
                 st.metric("👁️ Displayed Cities", len(selected_cities))
             
             with col3:
-                history = load_weather_history()
-                st.metric("📜 Records Stored", len(history))
+                st.metric("📜 Records Stored", history_store.count())
             
             with col4:
                 st.metric("🌍 Data Points", len(weather_data))
             
+            # Memory held by the in-process hot tier of recent observations
+            hot_stats = hot_tier.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("🔥 Hot-Tier Cities", hot_stats['cities'])
+            
+            with col2:
+                st.metric("🧮 Hot-Tier Samples", hot_stats['samples'])
+            
+            with col3:
+                st.metric("🧠 Hot-Tier KB", f"{hot_stats['bytes'] / 1024:,.1f}")
+            
+            with col4:
+                st.metric("🏙️ KB per City", f"{hot_stats['bytes_per_city'] / 1024:,.1f}")
+            
+            cache_stats = response_cache.stats()
+            lookups = cache_stats['hits'] + cache_stats['misses']
+            hit_rate = cache_stats['hits'] / lookups * 100 if lookups else 0
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("⚡ Cache Hits", cache_stats['hits'])
+            
+            with col2:
+                st.metric("🐢 Cache Misses", cache_stats['misses'])
+            
+            with col3:
+                st.metric("🎯 Hit Rate", f"{hit_rate:.0f}%")
+            
+            with col4:
+                st.metric("🗃️ Cached Responses", cache_stats['size'])
+            
+            # Performance panel
+            if st.checkbox("⏱️ Show performance panel"):
+                st.markdown("#### This Render")
+                spans = pd.DataFrame(render_timings.spans, columns=['Stage', 'Seconds'])
+                if not spans.empty:
+                    st.dataframe(
+                        spans.groupby('Stage', sort=False)['Seconds'].agg(['count', 'sum']).rename(
+                            columns={'count': 'Calls', 'sum': 'Seconds'}
+                        ),
+                        use_container_width=True
+                    )
+                st.caption(
+                    f"Elapsed so far: {render_timings.elapsed() * 1000:.1f} ms | "
+                    + " | ".join(f"{name}: {value:,}" for name, value in sorted(render_timings.counters.items()))
+                )
+                
+                counters, stages = registry.snapshot()
+                st.markdown("#### Since Startup")
+                gauges = registry.gauge_snapshot()
+                if gauges:
+                    st.caption(
+                        f"Cold start: imports {gauges.get('cold_start_import_seconds', 0) * 1000:.0f} ms, "
+                        f"first render {gauges.get('cold_start_render_seconds', 0) * 1000:.0f} ms"
+                    )
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("🌐 API Calls", counters.get('api_calls', 0))
+                with col2:
+                    st.metric("📦 API KB Received", f"{counters.get('api_bytes_received', 0) / 1024:,.1f}")
+                with col3:
+                    st.metric("📖 History KB Read", f"{counters.get('history_bytes_read', 0) / 1024:,.1f}")
+                with col4:
+                    st.metric("✍️ History KB Written", f"{counters.get('history_bytes_written', 0) / 1024:,.1f}")
+                
+                with st.expander("Prometheus metrics"):
+                    prometheus_text = registry.to_prometheus()
+                    st.code(prometheus_text, language="text")
+                    st.download_button(
+                        "Download metrics", data=prometheus_text, file_name="weather_metrics.prom", mime="text/plain"
+                    )
+            
             # Data management
             st.markdown("---")
             st.subheader("🗂️ Data Management")
@@ -574,31 +1019,90 @@ else:
             
             with col1:
                 if st.button("📥 View Raw Data", use_container_width=True):
-                    st.subheader("Raw Weather History")
-                    history = load_weather_history()
-                    if not history.empty:
-                        st.dataframe(history, use_container_width=True)
-                    else:
-                        st.info("No data available")
+                    st.session_state.show_raw_data = not st.session_state.show_raw_data
             
             with col2:
                 if st.button("🗑️ Clear History", use_container_width=True):
-                    if os.path.exists("weather_history.csv"):
-                        os.remove("weather_history.csv")
+                    if history_store.count():
+                        history_store.clear()
+                        hot_tier.clear()
+                        alert_engine.clear()
                         st.success("✅ History cleared!")
                         st.rerun()
             
             with col3:
                 if st.button("💾 Export as CSV", use_container_width=True):
-                    history = load_weather_history()
-                    if not history.empty:
-                        csv = history.to_csv(index=False)
-                        st.download_button(
-                            label="Download CSV",
-                            data=csv,
-                            file_name=f"weather_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                            mime="text/csv"
-                        )
+                    st.session_state.show_export = not st.session_state.show_export
+            
+            # Raw data is paged server-side so only the visible rows are loaded
+            if st.session_state.show_raw_data:
+                st.subheader("Raw Weather History")
+                page_size = 100
+                raw_city = st.selectbox(
+                    "Filter by city:",
+                    options=["All cities"] + history_store.distinct_cities(),
+                    key="raw_city"
+                )
+                raw_city = None if raw_city == "All cities" else raw_city
+                total_rows = history_store.page(0, 0, city=raw_city)[1]
+                if total_rows:
+                    page_count = (total_rows - 1) // page_size + 1
+                    page_number = st.number_input(
+                        f"Page (of {page_count})", min_value=1, max_value=page_count, value=1
+                    )
+                    rows, _ = history_store.page((page_number - 1) * page_size, page_size, city=raw_city)
+                    st.dataframe(rows, use_container_width=True, hide_index=True)
+                    st.caption(f"Showing {len(rows)} of {total_rows} records")
+                else:
+                    st.info("No data available")
+            
+            # Export streams rows to a file chunk by chunk instead of building one big string
+            if st.session_state.show_export:
+                st.subheader("Export Weather History")
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    export_city = st.selectbox(
+                        "City:",
+                        options=["All cities"] + history_store.distinct_cities(),
+                        key="export_city"
+                    )
+                with col2:
+                    export_dates = st.date_input("Date range (optional):", value=(), key="export_dates")
+                with col3:
+                    export_format = st.radio("Format:", options=list(EXPORT_FORMATS), key="export_format")
+                
+                if st.button("📦 Prepare Export"):
+                    start = end = None
+                    if len(export_dates) == 2:
+                        start = datetime.combine(export_dates[0], datetime.min.time())
+                        end = datetime.combine(export_dates[1], datetime.max.time())
+                    export_path = export_history(
+                        history_store,
+                        fmt=export_format,
+                        city=None if export_city == "All cities" else export_city,
+                        start=start,
+                        end=end
+                    )
+                    extension, mime = EXPORT_FORMATS[export_format]
+                    try:
+                        export_size = os.path.getsize(export_path)
+                        # download_button loads the whole file into memory, so big exports are refused
+                        if export_size > MAX_EXPORT_BYTES:
+                            st.error(
+                                f"❌ This export is {export_size / 1024 ** 2:.0f} MB, over the "
+                                f"{MAX_EXPORT_BYTES / 1024 ** 2:.0f} MB limit. Pick a city, a date range "
+                                "or a compressed format, or use history_export.export_history() directly."
+                            )
+                        else:
+                            with open(export_path, "rb") as export_file:
+                                st.download_button(
+                                    label=f"Download {export_format}",
+                                    data=export_file,
+                                    file_name=f"weather_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}",
+                                    mime=mime
+                                )
+                    finally:
+                        os.remove(export_path)
             
             # Footer
             st.markdown("---")
@@ -618,3 +1122,5 @@ st.markdown("""
     <p>Made with 💙 | Data from OpenWeatherMap | Deployed on Streamlit</p>
 </div>
 """, unsafe_allow_html=True)
+
+finish_render(render_timings)
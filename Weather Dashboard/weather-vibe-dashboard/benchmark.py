@@ -0,0 +1,270 @@
+"""Performance benchmarks for the dashboard's data path.
+
+Drives the fetch layer against a local stub API and the history store
+against synthetic weather_history.csv files, then reports wall time and
+peak Python memory. Results can be saved as a baseline and later runs
+compared against it:
+
+    python benchmark.py --quick
+    python benchmark.py --save-baseline
+    python benchmark.py --sizes 10000 100000 1000000 10000000
+    python benchmark.py              # fails if slower than the baseline
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+import weather_api
+from alerts import AlertEngine
+from history_store import CsvHistoryBackend, load_weather_history, make_history_record
+from history_stats import DailyStatsCache, daily_matrix, rolling_anomalies
+from hot_tier import HotTier
+from stub_server import CONDITIONS, start_stub_server
+
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_CITY_COUNTS = [1, 10, 30, 100]
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+GENERATE_CHUNK_ROWS = 500_000
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_ALERT_OBSERVATIONS = 500_000
+ALERT_CITIES = 500
+
+# ============================================
+# HELPERS
+# ============================================
+def app_modules(path=APP_FILE):
+    """The project's own modules app.py imports at top level, i.e. before its first paint."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    here = os.path.dirname(path)
+    names = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module)
+    return [
+        name for name in dict.fromkeys(names)
+        if os.path.exists(os.path.join(here, f"{name.split('.')[0]}.py"))
+    ]
+
+def measure(fn, *args, **kwargs):
+    """Run fn once; return (result, wall seconds)."""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def measure_peak(fn, *args, **kwargs):
+    """Run fn once under tracemalloc; return peak traced bytes.
+
+    Kept separate from measure() because tracing slows pandas down severalfold.
+    """
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def generate_history(path, rows, cities=100, seed=0):
+    """Write a synthetic weather_history.csv with `rows` rows, in chunks."""
+    rng = np.random.default_rng(seed)
+    city_names = np.array([f"City {i}" for i in range(cities)])
+    start = pd.Timestamp("2024-01-01")
+    written = 0
+    with open(path, "w", newline="") as f:
+        while written < rows:
+            n = min(GENERATE_CHUNK_ROWS, rows - written)
+            offsets = pd.to_timedelta(np.arange(written, written + n) * 60 // cities, unit="s")
+            chunk = pd.DataFrame({
+                'timestamp': (start + offsets).strftime("%Y-%m-%d %H:%M:%S"),
+                'city': city_names[np.arange(written, written + n) % cities],
+                'temperature_c': np.round(rng.normal(18, 8, n), 1),
+                'humidity': rng.integers(20, 100, n),
+                'condition': rng.choice(CONDITIONS, n)
+            })
+            chunk.to_csv(f, header=written == 0, index=False)
+            written += n
+
+# ============================================
+# BENCHMARKS
+# ============================================
+def bench_fetch(city_counts, latency, error_rate):
+    server, base_url = start_stub_server(latency=latency, error_rate=error_rate)
+    weather_api.set_base_url(base_url)
+    weather_api.city_ids.path = None
+    results = {}
+    try:
+        for count in city_counts:
+            cities = [f"Bench City {i}" for i in range(count)]
+            weather_api.breaker.record_success()
+            (data, errors), elapsed = measure(
+                weather_api.fetch_weather_batch, "bench-key", cities, use_cache=False, mode="city"
+            )
+            weather_api.breaker.record_success()
+            peak = measure_peak(weather_api.fetch_weather_batch, "bench-key", cities, use_cache=False, mode="city")
+            results[f"fetch.cities={count}.wall_s"] = elapsed
+            results[f"fetch.cities={count}.peak_mb"] = peak / 1e6
+            print(f"fetch    {count:>8} cities  {elapsed:8.3f}s  {peak / 1e6:8.1f} MB  ({len(errors)} errors)")
+    finally:
+        server.shutdown()
+    return results
+
+def bench_startup(repeats=3):
+    """Time the app's module imports in a fresh interpreter (best of `repeats`)."""
+    script = (
+        "import time; started = time.perf_counter(); "
+        f"import {', '.join(app_modules())}; "
+        "print(time.perf_counter() - started)"
+    )
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    elapsed = min(
+        float(subprocess.run([sys.executable, "-c", script], cwd=cwd, capture_output=True, text=True, check=True).stdout)
+        for _ in range(repeats)
+    )
+    print(f"startup  app imports  {elapsed * 1000:8.1f}ms")
+    return {"startup.app_imports_s": elapsed}
+
+def bench_history(sizes, workdir):
+    results = {}
+    for rows in sizes:
+        path = os.path.join(workdir, f"history_{rows}.csv")
+        generate_history(path, rows)
+        size_mb = os.path.getsize(path) / 1e6
+
+        record = make_history_record("City 0", 20.0, 50, "Clear")
+        store = CsvHistoryBackend(path)
+        _, write_s = measure(store.append, [record] * 30)
+
+        _, read_s = measure(load_weather_history, path)
+        read_peak = measure_peak(load_weather_history, path)
+
+        store = CsvHistoryBackend(path)
+        _, parse_s = measure(store.load_all)
+        parse_peak = measure_peak(CsvHistoryBackend(path).load_all)
+        _, trend_s = measure(store.latest_n, "City 0", 7)
+        store.append([record])
+        _, incremental_s = measure(store.load_all)
+        # Synthetic history is dated 2024, so warm over all of it
+        hot = HotTier(window=timedelta(days=365 * 100))
+        _, warm_s = measure(hot.sync, store)
+        _, hot_s = measure(hot.latest, "City 0", 7)
+        hot_stats = hot.stats()
+        daily, stats_s = measure(DailyStatsCache(store).get)
+        _, anomalies_s = measure(lambda: rolling_anomalies(daily_matrix(daily)))
+
+        prefix = f"history.rows={rows}"
+        results.update({
+            f"{prefix}.append_30_s": write_s,
+            f"{prefix}.read_csv_s": read_s,
+            f"{prefix}.read_csv_peak_mb": read_peak / 1e6,
+            f"{prefix}.parse_s": parse_s,
+            f"{prefix}.parse_peak_mb": parse_peak / 1e6,
+            f"{prefix}.trend_filter_s": trend_s,
+            f"{prefix}.incremental_reload_s": incremental_s,
+            f"{prefix}.hot_tier_warm_s": warm_s,
+            f"{prefix}.hot_tier_latest_s": hot_s,
+            f"{prefix}.hot_tier_kb_per_city": hot_stats['bytes_per_city'] / 1024,
+            f"{prefix}.daily_stats_s": stats_s,
+            f"{prefix}.anomalies_s": anomalies_s,
+        })
+        print(
+            f"history  {rows:>8} rows ({size_mb:7.1f} MB)  append {write_s * 1000:7.2f}ms  "
+            f"read {read_s:7.3f}s  parse {parse_s:7.3f}s ({parse_peak / 1e6:7.1f} MB)  "
+            f"trend {trend_s * 1000:7.2f}ms  reload {incremental_s * 1000:7.2f}ms  "
+            f"hot warm {warm_s:6.3f}s  hot trend {hot_s * 1000:6.2f}ms ({hot_stats['bytes_per_city'] / 1024:.0f} KB/city)  "
+            f"daily stats {stats_s:6.3f}s  anomalies {anomalies_s * 1000:7.2f}ms"
+        )
+        os.remove(path)
+    return results
+
+def bench_alerts(observations, cities=ALERT_CITIES, seed=0):
+    """Stream synthetic observations through the default alert rules."""
+    rng = np.random.default_rng(seed)
+    names = [f"City {i}" for i in range(cities)]
+    # Every city reports every 10 minutes; temperatures random-walk so the drop rule fires now and then
+    steps = np.arange(observations) // cities
+    timestamps = (1_700_000_000 + steps * 600).tolist()
+    walks = np.cumsum(rng.normal(0, 1.5, (steps[-1] + 1, cities)), axis=0)
+    temperatures = np.round(18 + walks.reshape(-1)[:observations], 1).tolist()
+    humidity = rng.integers(40, 100, observations).tolist()
+    conditions = rng.choice(CONDITIONS, observations).tolist()
+
+    engine = AlertEngine()
+    observe = engine.observe
+
+    def run():
+        fired = 0
+        for i in range(observations):
+            fired += len(observe(names[i % cities], timestamps[i], temperatures[i], humidity[i], conditions[i]))
+        return fired
+
+    fired, elapsed = measure(run)
+    rate = observations / elapsed
+    print(f"alerts   {observations:>8} observations ({cities} cities)  {elapsed:7.3f}s  {rate:>10,.0f} obs/s  {fired} alerts")
+    return {"alerts.evaluate_s": elapsed}
+
+def compare(results, baseline, tolerance):
+    """Return the metrics that got worse than baseline by more than `tolerance`."""
+    regressions = []
+    for name, value in results.items():
+        expected = baseline.get(name)
+        # Ignore sub-millisecond timings; they are dominated by noise
+        if expected is None or (name.endswith("_s") and expected < 0.001):
+            continue
+        if value > expected * (1 + tolerance):
+            regressions.append((name, expected, value))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the weather dashboard data path.")
+    parser.add_argument("--quick", action="store_true", help="small run for a fast sanity check")
+    parser.add_argument("--cities", type=int, nargs="+", default=DEFAULT_CITY_COUNTS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="history rows per file")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub requests failing with 503")
+    parser.add_argument("--observations", type=int, default=DEFAULT_ALERT_OBSERVATIONS, help="observations fed to the alert rules")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing")
+    args = parser.parse_args()
+
+    if args.quick:
+        args.cities, args.sizes, args.observations = [1, 10], [10_000], 50_000
+
+    results = {}
+    results.update(bench_startup())
+    results.update(bench_fetch(args.cities, args.latency, args.error_rate))
+    with tempfile.TemporaryDirectory() as workdir:
+        results.update(bench_history(args.sizes, workdir))
+    results.update(bench_alerts(args.observations))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for name, expected, value in regressions:
+            print(f"REGRESSION {name}: {expected:.4f} -> {value:.4f}")
+        if regressions:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import bisect
+import csv
+import difflib
+import json
+import os
+import threading
+import unicodedata
+from collections import namedtuple
+
+from history_store import file_lock
+
+# ============================================
+# CITY REGISTRY
+# ============================================
+REGISTRY_FILE = os.getenv("WEATHER_CITY_REGISTRY_FILE", "city_registry.json") or None
+# Pre-registry index of lowercased name -> id; migrated into the registry on first load
+LEGACY_ID_FILE = os.getenv("WEATHER_CITY_ID_FILE", "city_ids.json")
+# Offline list of well-known cities (name, country, lat, lon) for the "Add a new city" box
+CITY_LIST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cities.csv")
+MAX_SUGGESTIONS = 8
+
+CityRecord = namedtuple("CityRecord", "id name country lat lon")
+
+def normalize_city(name):
+    """Case-, accent- and whitespace-insensitive lookup key ("  São Paulo" -> "sao paulo")."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().split())
+
+def record_from_payload(data):
+    """Canonical CityRecord from a /weather payload, or None without an id."""
+    if not data or not data.get("id"):
+        return None
+    coord = data.get("coord") or {}
+    return CityRecord(
+        data["id"], data.get("name") or "", (data.get("sys") or {}).get("country") or "",
+        coord.get("lat"), coord.get("lon"),
+    )
+
+def _label(record):
+    return f"{record.name}, {record.country}" if record.country else record.name
+
+def _read_registry(path):
+    """(aliases, records) stored in a registry file; empty if missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            stored = json.load(f)
+        aliases = dict(stored.get("aliases", {}))
+        records = {int(city_id): CityRecord(*record) for city_id, record in stored.get("cities", {}).items()}
+        return aliases, records
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}, {}
+
+class CityRegistry:
+    """Persistent mapping of what users typed to canonical OpenWeatherMap cities.
+
+    Every spelling ("nyc", "New York", "new york ") is an alias of one
+    CityRecord, learned from the first successful response, so a city is
+    resolved by name once and fetched by id afterwards. Drop-in replacement
+    for the old name -> id index: get() still returns the id.
+
+    The app and collector.py share the file, so flush() merges with what is
+    on disk under a cross-process lock instead of overwriting it.
+    """
+
+    def __init__(self, path=None, legacy_path=LEGACY_ID_FILE):
+        self.path = path
+        self._aliases = {}
+        self._records = {}
+        # Aliases rebound since the last flush: alias -> (id, overrides the file's binding)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path and os.path.exists(path):
+            self._aliases, self._records = _read_registry(path)
+        elif path and legacy_path and os.path.exists(legacy_path):
+            try:
+                with open(legacy_path, "r") as f:
+                    self._aliases = {normalize_city(name): city_id for name, city_id in json.load(f).items()}
+                self._dirty = bool(self._aliases)
+            except (OSError, ValueError, AttributeError):
+                self._aliases = {}
+
+    def get(self, city):
+        """OpenWeatherMap id for a city name, or None if it was never resolved."""
+        with self._lock:
+            return self._aliases.get(normalize_city(city))
+
+    def remember(self, city, data):
+        """Record `city` as an alias of the city described by a /weather payload."""
+        record = record_from_payload(data)
+        if record is None:
+            return None
+        typed = normalize_city(city)
+        # The canonical spellings never take over an alias already bound to another city
+        # ("London" stays London, GB after someone adds London, CA)
+        canonical = {normalize_city(record.name), normalize_city(_label(record))} - {"", typed}
+        with self._lock:
+            if self._records.get(record.id) != record:
+                self._records[record.id] = record
+                self._dirty = True
+            if typed and self._aliases.get(typed) != record.id:
+                self._aliases[typed] = record.id
+                self._pending[typed] = (record.id, True)
+                self._dirty = True
+            for alias in canonical:
+                if alias not in self._aliases:
+                    self._aliases[alias] = record.id
+                    self._pending[alias] = (record.id, False)
+                    self._dirty = True
+        return record
+
+    def canonical_name(self, record):
+        """Shortest name that resolves back to `record`: "London", else "London, CA"."""
+        with self._lock:
+            if self._aliases.get(normalize_city(record.name)) == record.id:
+                return record.name
+        return _label(record)
+
+    def records(self):
+        with self._lock:
+            return list(self._records.values())
+
+    def flush(self):
+        """Merge unsaved aliases into the registry file and pick up other processes' additions."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+        with file_lock(f"{self.path}.lock"):
+            stored_aliases, stored_records = _read_registry(self.path)
+            with self._lock:
+                aliases = {**self._aliases, **stored_aliases}
+                for alias, (city_id, override) in self._pending.items():
+                    if override or alias not in stored_aliases:
+                        aliases[alias] = city_id
+                records = {**stored_records, **self._records}
+                self._aliases, self._records = aliases, records
+                self._pending = {}
+                self._dirty = False
+                snapshot = {
+                    "aliases": dict(aliases),
+                    "cities": {str(city_id): list(record) for city_id, record in records.items()},
+                }
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+# ============================================
+# CITY SEARCH
+# ============================================
+class CitySearchIndex:
+    """Prefix and fuzzy search over the bundled city list plus resolved cities.
+
+    Names are kept sorted by their normalised key, so a prefix query is two
+    bisections; fuzzy matching (difflib) only runs when no prefix matches.
+    """
+
+    def __init__(self, path=CITY_LIST_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys = None
+        self._labels = None
+        self._names = {}
+        self._extra = set()
+
+    def _load(self):
+        if self._keys is not None:
+            return
+        entries = {}
+        try:
+            with open(self.path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    label = f"{row['name']}, {row['country']}" if row.get('country') else row['name']
+                    entries[normalize_city(label)] = label
+        except OSError:
+            pass
+        self._set(entries)
+
+    def _set(self, entries):
+        keys = sorted(entries)
+        names = {}
+        for index, key in enumerate(keys):
+            # Fuzzy matching compares names without the country suffix
+            names.setdefault(key.rsplit(",", 1)[0], []).append(index)
+        self._keys = keys
+        self._labels = [entries[key] for key in keys]
+        self._names = names
+
+    def add(self, records):
+        """Make resolved cities searchable too (e.g. registry.records())."""
+        with self._lock:
+            self._load()
+            fresh = {}
+            for record in records:
+                label = _label(record)
+                key = normalize_city(label)
+                if record.name and key not in self._extra:
+                    fresh[key] = label
+            if fresh:
+                self._extra.update(fresh)
+                self._set({**dict(zip(self._keys, self._labels)), **fresh})
+
+    def search(self, query, limit=MAX_SUGGESTIONS):
+        """Labels ("Paris, FR") matching `query` by prefix, else by similarity."""
+        key = normalize_city(query)
+        if not key:
+            return []
+        with self._lock:
+            self._load()
+            keys, labels, names = self._keys, self._labels, self._names
+        start = bisect.bisect_left(keys, key)
+        end = bisect.bisect_left(keys, key + "\uffff", start)
+        if start < end:
+            return labels[start:min(end, start + limit)]
+        close = difflib.get_close_matches(key, list(names), n=limit, cutoff=0.6)
+        return [labels[index] for name in close for index in names[name]][:limit]
+
+city_registry = CityRegistry(path=REGISTRY_FILE)
+city_search = CitySearchIndex()
@@ -0,0 +1,112 @@
+"""Background weather collector.
+
+Polls every city in favorite_cities.json on a schedule, records each
+observation in the history store and refreshes the latest-conditions
+snapshot that the dashboard reads. Every COMPACT_INTERVAL it also applies
+the history retention policy (see retention.py). Run it alongside the app:
+
+    OPENWEATHER_API_KEY=... python collector.py
+    python collector.py --once
+"""
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+
+from weather_api import request_weather
+from city_registry import city_registry
+from history_store import open_history_store, record_observations, save_latest_snapshot
+from favorites import load_favorite_cities
+from retention import compact
+from alerts import alert_engine
+
+# ============================================
+# CONFIGURATION
+# ============================================
+COLLECT_INTERVAL = int(os.getenv("WEATHER_COLLECT_INTERVAL", "600"))
+# Free OpenWeatherMap plans allow 60 calls per minute
+RATE_LIMIT_PER_MINUTE = int(os.getenv("WEATHER_RATE_LIMIT", "50"))
+JITTER_FRACTION = 0.1
+COMPACT_INTERVAL = int(os.getenv("WEATHER_COMPACT_INTERVAL", "3600"))
+
+logger = logging.getLogger("weather_collector")
+
+class RateLimiter:
+    """Space calls out so no more than `per_minute` start in any minute."""
+
+    def __init__(self, per_minute=RATE_LIMIT_PER_MINUTE):
+        self.min_interval = 60.0 / max(1, per_minute)
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def collect_once(api_key, store, limiter):
+    """Fetch every favorite city once and persist the results."""
+    cities = load_favorite_cities()
+    # Replay stored observations first, so a restart does not re-announce alerts
+    alert_engine.prime_from_store(store, cities)
+    weather_data = {}
+    for city in cities:
+        limiter.wait()
+        data, error = request_weather(api_key, city)
+        if data:
+            weather_data[city] = data
+        else:
+            logger.warning("%s: %s", city, error)
+
+    # Share the ids resolved this cycle with the dashboard
+    city_registry.flush()
+    if weather_data:
+        record_observations(store, weather_data)
+        save_latest_snapshot(weather_data)
+        for alert in alert_engine.observe_weather_data(weather_data):
+            logger.warning("Alert for %s: %s", alert.city, alert.message)
+    logger.info("Collected %d/%d cities", len(weather_data), len(cities))
+    return weather_data
+
+def run(api_key, interval=COLLECT_INTERVAL, once=False):
+    """Poll forever (or once), sleeping a jittered interval between cycles."""
+    store = open_history_store()
+    limiter = RateLimiter()
+    last_compaction = None
+    while True:
+        started = time.monotonic()
+        collect_once(api_key, store, limiter)
+        if last_compaction is None or started - last_compaction >= COMPACT_INTERVAL:
+            try:
+                compact(store)
+            except Exception:
+                logger.exception("History compaction failed")
+            last_compaction = started
+        if once:
+            return
+        jitter = random.uniform(-JITTER_FRACTION, JITTER_FRACTION) * interval
+        time.sleep(max(0.0, interval + jitter - (time.monotonic() - started)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect weather for favorite cities in the background.")
+    parser.add_argument("--interval", type=int, default=COLLECT_INTERVAL, help="seconds between polls")
+    parser.add_argument("--once", action="store_true", help="poll a single time and exit")
+    args = parser.parse_args()
+
+    api_key = os.getenv("OPENWEATHER_API_KEY")
+    if not api_key:
+        parser.error("set OPENWEATHER_API_KEY to your OpenWeatherMap API key")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        run(api_key, interval=args.interval, once=args.once)
+    except KeyboardInterrupt:
+        logger.info("Collector stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import re
+from enum import Enum
+from functools import lru_cache
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ============================================
+# CONDITION NORMALISATION
+# ============================================
+class Condition(str, Enum):
+    """Canonical weather conditions (OpenWeatherMap `main` groups)."""
+    CLEAR = "Clear"
+    CLOUDS = "Clouds"
+    DRIZZLE = "Drizzle"
+    RAIN = "Rain"
+    THUNDERSTORM = "Thunderstorm"
+    SNOW = "Snow"
+    MIST = "Mist"
+    SMOKE = "Smoke"
+    HAZE = "Haze"
+    DUST = "Dust"
+    FOG = "Fog"
+    SAND = "Sand"
+    ASH = "Ash"
+    SQUALL = "Squall"
+    TORNADO = "Tornado"
+    UNKNOWN = "Unknown"
+
+# Atmosphere codes (7xx) map one-to-one onto groups; other families by hundreds
+_ATMOSPHERE_IDS = {
+    701: Condition.MIST, 711: Condition.SMOKE, 721: Condition.HAZE, 731: Condition.DUST,
+    741: Condition.FOG, 751: Condition.SAND, 761: Condition.DUST, 762: Condition.ASH,
+    771: Condition.SQUALL, 781: Condition.TORNADO,
+}
+_ID_FAMILIES = {2: Condition.THUNDERSTORM, 3: Condition.DRIZZLE, 5: Condition.RAIN, 6: Condition.SNOW}
+
+# Exact (lowercased) names, including free-text descriptions seen in history
+_EXACT = {condition.value.lower(): condition for condition in Condition}
+_EXACT.update({
+    "sunny": Condition.CLEAR,
+    "clear sky": Condition.CLEAR,
+    "overcast": Condition.CLOUDS,
+    "cloudy": Condition.CLOUDS,
+    "partly cloudy": Condition.CLOUDS,
+})
+
+# Fallback patterns, most specific first ("thunderstorm with light rain" is a thunderstorm)
+_PATTERNS = [(re.compile(pattern), condition) for pattern, condition in [
+    (r"tornado|funnel", Condition.TORNADO),
+    (r"squall", Condition.SQUALL),
+    (r"thunder|lightning|t-?storm", Condition.THUNDERSTORM),
+    (r"drizzle", Condition.DRIZZLE),
+    (r"snow|sleet|flurr|blizzard", Condition.SNOW),
+    (r"rain|shower", Condition.RAIN),
+    (r"volcanic|\bash\b", Condition.ASH),
+    (r"smoke", Condition.SMOKE),
+    (r"sand", Condition.SAND),
+    (r"dust", Condition.DUST),
+    (r"fog", Condition.FOG),
+    (r"haze", Condition.HAZE),
+    (r"mist", Condition.MIST),
+    (r"cloud|overcast", Condition.CLOUDS),
+    (r"clear|sunny|fair", Condition.CLEAR),
+]]
+
+def from_owm_id(condition_id):
+    """Map an OpenWeatherMap numeric condition id (e.g. 501, 804) to a Condition."""
+    if condition_id == 800:
+        return Condition.CLEAR
+    if 801 <= condition_id <= 804:
+        return Condition.CLOUDS
+    if condition_id in _ATMOSPHERE_IDS:
+        return _ATMOSPHERE_IDS[condition_id]
+    return _ID_FAMILIES.get(condition_id // 100, Condition.UNKNOWN)
+
+@lru_cache(maxsize=4096)
+def classify(raw):
+    """Map a raw condition (OWM `main`, free-text description or numeric id) to a Condition."""
+    if isinstance(raw, Condition):
+        return raw
+    if not isinstance(raw, str):
+        try:
+            return from_owm_id(int(raw))
+        except (TypeError, ValueError, OverflowError):
+            return Condition.UNKNOWN
+    text = raw.strip().lower()
+    if text.isdigit():
+        return from_owm_id(int(text))
+    if text in _EXACT:
+        return _EXACT[text]
+    for pattern, condition in _PATTERNS:
+        if pattern.search(text):
+            return condition
+    return Condition.UNKNOWN
+
+_CATEGORIES = [condition.value for condition in Condition]
+_CATEGORY_CODES = {name: code for code, name in enumerate(_CATEGORIES)}
+_UNKNOWN_CODE = _CATEGORY_CODES[Condition.UNKNOWN.value]
+
+def condition_code(raw):
+    """Small integer code of classify(raw), stable for the lifetime of the Condition enum."""
+    return _CATEGORY_CODES[classify(raw).value]
+
+@lru_cache(maxsize=1)
+def _condition_dtype():
+    return pd.CategoricalDtype(_CATEGORIES)
+
+def conditions_from_codes(codes):
+    """Categorical of canonical names for an array of condition codes."""
+    return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int64), dtype=_condition_dtype())
+
+def classify_column(values):
+    """Vectorised classify(): returns a categorical Series of canonical names.
+
+    Only the distinct raw values are classified, so cost scales with the
+    number of unique conditions rather than the number of rows.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    lookup = np.array([condition_code(raw) for raw in uniques], dtype=np.int64)
+    canonical = np.where(codes >= 0, lookup[codes] if len(lookup) else codes, _UNKNOWN_CODE)
+    return pd.Series(conditions_from_codes(canonical), index=values.index)
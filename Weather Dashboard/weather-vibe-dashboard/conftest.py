@@ -0,0 +1,25 @@
+import pytest
+
+from history_store import CsvHistoryBackend, SqliteHistoryBackend
+
+@pytest.fixture(params=["csv", "sqlite"])
+def backend(request):
+    """History store class, once per backend."""
+    return CsvHistoryBackend if request.param == "csv" else SqliteHistoryBackend
+
+@pytest.fixture
+def store(backend, tmp_path):
+    """Empty history store in a temp directory, once per backend."""
+    return backend(str(tmp_path / ("history.csv" if backend is CsvHistoryBackend else "history.db")))
+
+def _payload(observed, condition="Clouds", temperature=20.0, humidity=60):
+    return {
+        'dt': int(observed.timestamp()),
+        'main': {'temp': temperature, 'humidity': humidity},
+        'weather': [{'main': condition}],
+    }
+
+@pytest.fixture
+def payload():
+    """Builder for a minimal current-weather API payload observed at a datetime."""
+    return _payload
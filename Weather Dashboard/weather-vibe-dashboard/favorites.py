@@ -0,0 +1,72 @@
+import json
+import os
+import threading
+
+from history_store import file_lock
+
+# ============================================
+# FAVORITE CITIES
+# ============================================
+FAVORITES_FILE = "favorite_cities.json"
+
+# Parsed favorites shared by every session, re-read only when the file changes
+_cache = {}
+_cache_lock = threading.Lock()
+# Serialises add/remove within the process (every Streamlit session is a thread)
+_write_lock = threading.Lock()
+
+def load_favorite_cities(path=FAVORITES_FILE):
+    """Load favorite cities from JSON file."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return []
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == signature:
+            return list(cached[1])
+    try:
+        with open(path, "r") as f:
+            cities = json.load(f).get("cities", [])
+    except Exception:
+        return []
+    with _cache_lock:
+        _cache[path] = (signature, cities)
+    return list(cities)
+
+def save_favorite_cities(cities, path=FAVORITES_FILE):
+    """Save favorite cities to JSON file, keeping their order and dropping duplicates.
+
+    The file is replaced atomically, so a reader never sees a half-written list.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"cities": list(dict.fromkeys(cities))}, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _read_favorite_cities(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f).get("cities", [])
+    except (OSError, ValueError, AttributeError):
+        return []
+
+def _update_favorite_cities(change, path):
+    # Read-modify-write under one lock, so sessions and other app processes
+    # editing at once don't drop each other's changes; the file is re-read
+    # inside the lock rather than trusting the cache
+    with _write_lock, file_lock(f"{path}.lock"):
+        cities = _read_favorite_cities(path)
+        updated = change(cities)
+        if updated != cities:
+            save_favorite_cities(updated, path)
+        return updated
+
+def add_favorite_city(city, path=FAVORITES_FILE):
+    """Append a city unless it is already a favorite; returns the updated list."""
+    return _update_favorite_cities(lambda cities: cities if city in cities else cities + [city], path)
+
+def remove_favorite_city(city, path=FAVORITES_FILE):
+    """Remove a city from the favorites; returns the updated list."""
+    return _update_favorite_cities(lambda cities: [name for name in cities if name != city], path)
@@ -0,0 +1,198 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from city_registry import normalize_city
+from history_store import file_lock, write_csv_atomic
+from lazy import lazy_import
+from metrics import increment
+from weather_api import inflight, request_forecast
+
+pd = lazy_import("pandas")
+
+# ============================================
+# FORECAST STORE
+# ============================================
+# OpenWeatherMap re-issues the 5-day / 3-hour forecast every few hours; one
+# fetch per city per cycle is enough no matter how many sessions ask
+ISSUE_CYCLE = int(os.getenv("WEATHER_FORECAST_CYCLE", str(3 * 3600)))
+# Issues kept per city (older ones are only useful for forecast-vs-actual comparisons)
+MAX_ISSUES_PER_CITY = 8
+# One small CSV per city in this directory; empty keeps forecasts in memory only
+FORECAST_DIR = os.getenv("WEATHER_FORECAST_DIR", "weather_forecast") or None
+# A failed fetch is not retried for this many seconds (the breaker covers outages)
+FAILURE_BACKOFF = 300
+FORECAST_COLUMNS = ['city', 'issued_at', 'valid_at', 'temperature_c', 'humidity', 'condition', 'pop']
+
+def issue_cycle(now=None):
+    """Start of the forecast issue cycle containing `now` (epoch seconds), as local time."""
+    now = time.time() if now is None else now
+    return datetime.fromtimestamp(int(now) // ISSUE_CYCLE * ISSUE_CYCLE)
+
+def forecast_rows(city, issued_at, payload):
+    """Flatten a /forecast payload into one row per valid time."""
+    entries = payload.get('list', [])
+    return pd.DataFrame({
+        'city': city,
+        'issued_at': pd.Timestamp(issued_at),
+        # Local wall-clock time, matching how history rows are stamped
+        'valid_at': pd.to_datetime([datetime.fromtimestamp(entry['dt']) for entry in entries]),
+        'temperature_c': [entry['main']['temp'] for entry in entries],
+        'humidity': [entry['main']['humidity'] for entry in entries],
+        'condition': [entry['weather'][0]['main'] for entry in entries],
+        'pop': [entry.get('pop', 0.0) for entry in entries],
+    }, columns=FORECAST_COLUMNS)
+
+class ForecastStore:
+    """Forecast rows keyed by (city, issued_at, valid_at), persisted per city.
+
+    City and condition are categorical and the measurements float32, so a
+    full 40-step forecast costs a few KB per city and issue. Each city has
+    its own file in FORECAST_DIR holding at most MAX_ISSUES_PER_CITY issues,
+    so storing an issue rewrites a few hundred rows however many cities are
+    tracked. Writes re-read the city's file under a cross-process lock, and
+    readers re-read a file when another process has changed it.
+    """
+
+    def __init__(self, directory=FORECAST_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        # city -> (file signature, frame)
+        self._frames = {}
+
+    @staticmethod
+    def _compact(frame):
+        return frame.astype({
+            'city': 'category',
+            'issued_at': 'datetime64[ns]',
+            'valid_at': 'datetime64[ns]',
+            'condition': 'category',
+            'temperature_c': 'float32',
+            'humidity': 'float32',
+            'pop': 'float32',
+        })
+
+    def _path(self, city):
+        # Readable and filesystem-safe, with a digest so distinct names never share a file
+        slug = re.sub(r"[^a-z0-9]+", "-", normalize_city(city)).strip("-")[:40] or "city"
+        digest = hashlib.sha1(city.encode("utf-8")).hexdigest()[:10]
+        return os.path.join(self.directory, f"{slug}-{digest}.csv")
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read(self, path=None):
+        frame = pd.DataFrame(columns=FORECAST_COLUMNS)
+        if path:
+            try:
+                frame = pd.read_csv(path, parse_dates=['issued_at', 'valid_at'])
+            except (OSError, ValueError):
+                pass
+        return self._compact(frame.reindex(columns=FORECAST_COLUMNS))
+
+    def _city_frame(self, city):
+        """Stored rows of one city, re-read only when its file has changed."""
+        if not self.directory:
+            with self._lock:
+                cached = self._frames.get(city)
+            return cached[1] if cached else self._read()
+        path = self._path(city)
+        signature = self._signature(path)
+        with self._lock:
+            cached = self._frames.get(city)
+        if cached and cached[0] == signature:
+            return cached[1]
+        frame = self._read(path)
+        with self._lock:
+            self._frames[city] = (signature, frame)
+        return frame
+
+    def issues(self, city):
+        """Issue times stored for a city, oldest first."""
+        return sorted(self._city_frame(city)['issued_at'].unique())
+
+    def has_issue(self, city, issued_at):
+        return pd.Timestamp(issued_at) in self.issues(city)
+
+    def latest(self, city):
+        """Rows of the newest stored issue for a city, ordered by valid time."""
+        rows = self._city_frame(city)
+        if rows.empty:
+            return rows.reset_index(drop=True)
+        rows = rows[rows['issued_at'] == rows['issued_at'].max()]
+        return rows.sort_values('valid_at').reset_index(drop=True)
+
+    def _merge(self, frame, rows, issued_at):
+        """A city's rows with one issue replaced, keeping the newest MAX_ISSUES_PER_CITY issues."""
+        recent = sorted(set(frame['issued_at']) | {issued_at})[-MAX_ISSUES_PER_CITY:]
+        keep = (frame['issued_at'] != issued_at) & frame['issued_at'].isin(recent)
+        merged = pd.concat([frame[keep].astype({'city': 'object', 'condition': 'object'}), rows], ignore_index=True)
+        return self._compact(merged)
+
+    def add(self, city, issued_at, payload):
+        """Store one issue for a city, replacing any rows with the same key."""
+        rows = forecast_rows(city, issued_at, payload)
+        issued_at = pd.Timestamp(issued_at)
+        if not self.directory:
+            with self._lock:
+                cached = self._frames.get(city)
+                frame = self._merge(cached[1] if cached else self._read(), rows, issued_at)
+                self._frames[city] = (None, frame)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._path(city)
+            # Merge with the file as it is now, so issues other processes stored survive
+            with file_lock(f"{path}.lock"):
+                frame = self._merge(self._read(path), rows, issued_at)
+                write_csv_atomic(frame, path)
+                signature = self._signature(path)
+            with self._lock:
+                self._frames[city] = (signature, frame)
+        increment("forecast_rows_stored", len(rows))
+        return len(rows)
+
+forecast_store = ForecastStore()
+# (city, issue cycle) -> (monotonic time, error), so a failing city is not retried on every rerun
+_failures = {}
+_failures_lock = threading.Lock()
+
+def fetch_forecast(api_key, city, store=None):
+    """Return (rows, error) for a city's latest forecast, fetching at most once per issue cycle.
+
+    Concurrent sessions asking for the same city share one request. When the
+    fetch fails the newest stored issue (possibly empty) is returned with the error.
+    """
+    store = store or forecast_store
+    cycle = issue_cycle()
+    key = (city, cycle)
+    if store.has_issue(city, cycle):
+        increment("forecast_cache_hits")
+        return store.latest(city), None
+    with _failures_lock:
+        failed = _failures.get(key)
+    if failed and time.monotonic() - failed[0] < FAILURE_BACKOFF:
+        return store.latest(city), failed[1]
+
+    def fetch():
+        if store.has_issue(city, cycle):
+            return store.latest(city), None
+        increment("forecast_cache_misses")
+        data, error = request_forecast(api_key, city)
+        if error:
+            with _failures_lock:
+                for stale in [failed for failed in _failures if failed[1] != cycle]:
+                    del _failures[stale]
+                _failures[key] = (time.monotonic(), error)
+            return store.latest(city), error
+        store.add(city, cycle, data)
+        return store.latest(city), None
+
+    return inflight.do(("forecast",) + key, fetch, (pd.DataFrame(columns=FORECAST_COLUMNS), None))
@@ -0,0 +1,71 @@
+import gzip
+import importlib.util
+import os
+import tempfile
+
+from history_store import EXPORT_CHUNK_ROWS, TIMESTAMP_FORMAT
+
+# ============================================
+# HISTORY EXPORT
+# ============================================
+# Streamlit's download_button reads the whole file into memory, so the
+# largest export offered for download is capped
+MAX_EXPORT_BYTES = int(float(os.getenv("WEATHER_EXPORT_MAX_MB", "200")) * 1024 * 1024)
+# Parquet output needs pyarrow, which is optional
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+}
+if PARQUET_AVAILABLE:
+    EXPORT_FORMATS["Parquet"] = ("parquet", "application/vnd.apache.parquet")
+
+def _write_csv(chunks, f):
+    for index, chunk in enumerate(chunks):
+        chunk.to_csv(f, header=index == 0, index=False, date_format=TIMESTAMP_FORMAT)
+
+def _write_parquet(chunks, path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk.astype({'city': str}), preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        if writer is None:
+            # No matching rows: still write a valid file carrying the history schema
+            schema = pa.schema([
+                ('timestamp', pa.timestamp('ns')), ('city', pa.string()), ('temperature_c', pa.float64()),
+                ('humidity', pa.int64()), ('condition', pa.string()),
+            ])
+            writer = pq.ParquetWriter(path, schema)
+            writer.write_table(schema.empty_table())
+    finally:
+        if writer is not None:
+            writer.close()
+
+def export_history(store, fmt="CSV", city=None, start=None, end=None, chunk_size=EXPORT_CHUNK_ROWS):
+    """Write filtered history to a temporary file, one chunk at a time.
+
+    Writing copies one chunk of rows at a time out of the store. Returns
+    the path of the written file; the caller is responsible for removing
+    it (and for checking it against MAX_EXPORT_BYTES before serving it).
+    """
+    extension, _ = EXPORT_FORMATS[fmt]
+    fd, path = tempfile.mkstemp(suffix=f".{extension}", prefix="weather_export_")
+    os.close(fd)
+    chunks = store.iter_chunks(city=city, start=start, end=end, chunk_size=chunk_size)
+
+    if extension == "parquet":
+        _write_parquet(chunks, path)
+    elif extension == "csv.gz":
+        with gzip.open(path, "wt", newline="") as f:
+            _write_csv(chunks, f)
+    else:
+        with open(path, "w", newline="") as f:
+            _write_csv(chunks, f)
+    return path
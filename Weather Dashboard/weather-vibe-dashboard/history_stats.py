@@ -0,0 +1,141 @@
+import threading
+from datetime import timedelta
+
+from lazy import lazy_import
+from metrics import increment, timed
+from trends import ROLLUP_COLUMNS, combine_rollups, rollup_by_city
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ============================================
+# MULTI-CITY STATISTICS
+# ============================================
+# Days of daily means each anomaly z-score is measured against (the day itself excluded)
+ANOMALY_WINDOW = 14
+# Baseline days required before a z-score is reported; fewer give unstable spreads
+ANOMALY_MIN_DAYS = 7
+ANOMALY_THRESHOLD = 3.0
+# Days both cities need in common before their correlation is shown
+CORRELATION_MIN_DAYS = 3
+# Rows re-aggregated on each update start this far before the newest cached day,
+# so late rows for a city whose observation time trails the others still count
+REFRESH_OVERLAP = timedelta(days=1)
+
+DAILY_COLUMNS = ['timestamp', 'city'] + ROLLUP_COLUMNS
+
+def _daily_from_raw(store, start=None):
+    """Daily per-city rollups of raw history from `start` on, aggregated chunk by chunk."""
+    partials = [rollup_by_city(chunk, "D") for chunk in store.iter_chunks(start=start) if not chunk.empty]
+    if not partials:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    # A day can straddle chunks; combining folds the partial buckets together
+    return combine_rollups(pd.concat(partials, ignore_index=True), "D")
+
+def _daily_from_tiers(store):
+    """Compacted hourly/daily rollups from the retention tiers, coarsened to days."""
+    from retention import RETENTION_POLICY
+
+    frames = [store.read_tier(tier.name) for tier in RETENTION_POLICY if tier.freq is not None]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=DAILY_COLUMNS)
+    return combine_rollups(pd.concat(frames, ignore_index=True), "D")
+
+class DailyStatsCache:
+    """Daily min/mean/max of every city over the whole history, kept up to date incrementally.
+
+    Only rows from the newest cached day (less REFRESH_OVERLAP) onwards are
+    re-aggregated when the store grows; if rows were removed or rewritten
+    (cleared or compacted, see store.epoch()) everything is rebuilt,
+    including the retention tiers.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._cached = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        generation = self.store.generation()
+        epoch = self.store.epoch()
+        with self._lock:
+            cached = self._cached
+            if cached and cached['generation'] == generation and cached['epoch'] == epoch:
+                return cached['frame']
+
+            with timed("stats:daily"):
+                if cached and cached['epoch'] == epoch and not cached['raw'].empty:
+                    since = cached['raw']['timestamp'].max() - REFRESH_OVERLAP
+                    fresh = _daily_from_raw(self.store, start=since)
+                    raw = pd.concat([cached['raw'][cached['raw']['timestamp'] < since], fresh], ignore_index=True)
+                    archived = cached['archived']
+                else:
+                    increment("stats_daily_rebuilds")
+                    raw = _daily_from_raw(self.store)
+                    archived = _daily_from_tiers(self.store)
+                combined = pd.concat([archived, raw], ignore_index=True) if not archived.empty else raw
+                frame = combine_rollups(combined, "D") if not combined.empty else combined
+                frame = frame.sort_values(['city', 'timestamp'], ignore_index=True)
+
+            self._cached = {'generation': generation, 'epoch': epoch, 'raw': raw, 'archived': archived, 'frame': frame}
+            return frame
+
+_daily_caches = {}
+_daily_caches_lock = threading.Lock()
+
+def get_daily_stats(store):
+    """Flat daily rollups (timestamp, city, *_min/_mean/_max, samples) for every city."""
+    with _daily_caches_lock:
+        cache = _daily_caches.get(id(store))
+        if cache is None or cache.store is not store:
+            cache = _daily_caches[id(store)] = DailyStatsCache(store)
+    return cache.get()
+
+def daily_matrix(daily, field="temperature_c_mean", cities=None, days=None):
+    """Wide day x city frame of one daily statistic, with missing days as NaN rows.
+
+    `days` keeps only the last N calendar days; `cities` restricts and orders the columns.
+    """
+    if daily.empty:
+        return pd.DataFrame()
+    rows = daily if cities is None else daily[daily['city'].isin(cities)]
+    matrix = rows.pivot_table(index='timestamp', columns='city', values=field, aggfunc='mean', observed=True)
+    if matrix.empty:
+        return matrix
+    matrix = matrix.asfreq("D")
+    if days is not None:
+        matrix = matrix[matrix.index > matrix.index[-1] - pd.Timedelta(days=days)]
+    if cities is not None:
+        matrix = matrix.reindex(columns=[city for city in cities if city in matrix.columns])
+    return matrix
+
+def rolling_anomalies(matrix, window=ANOMALY_WINDOW, threshold=ANOMALY_THRESHOLD, min_days=ANOMALY_MIN_DAYS):
+    """Days whose value is `threshold`+ standard deviations from the city's preceding `window` days.
+
+    Computed for every city at once on the wide matrix; returns long rows
+    (timestamp, city, value, baseline, zscore), largest deviations first.
+    """
+    if matrix.empty:
+        return pd.DataFrame(columns=['timestamp', 'city', 'value', 'baseline', 'zscore'])
+    history = matrix.shift(1).rolling(window, min_periods=min_days)
+    baseline = history.mean()
+    spread = history.std()
+    zscores = (matrix - baseline) / spread.where(spread > 0)
+    scores = zscores.to_numpy()
+    days, columns = np.nonzero(np.abs(np.nan_to_num(scores)) >= threshold)
+    order = np.argsort(-np.abs(scores[days, columns]), kind='stable')
+    days, columns = days[order], columns[order]
+    return pd.DataFrame({
+        'timestamp': matrix.index[days],
+        'city': matrix.columns[columns],
+        'value': matrix.to_numpy()[days, columns],
+        'baseline': baseline.to_numpy()[days, columns],
+        'zscore': scores[days, columns],
+    })
+
+def city_correlation(matrix, min_days=CORRELATION_MIN_DAYS):
+    """Pearson correlation of daily values between every pair of cities in the matrix."""
+    if matrix.shape[1] < 2:
+        return pd.DataFrame()
+    return matrix.corr(min_periods=min_days)
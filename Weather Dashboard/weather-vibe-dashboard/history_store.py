@@ -0,0 +1,774 @@
+import csv
+import glob
+import io
+import json
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from lazy import lazy_import
+from metrics import increment, timed
+
+pd = lazy_import("pandas")
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ============================================
+# WEATHER HISTORY STORE
+# ============================================
+HISTORY_FILE = "weather_history.csv"
+HISTORY_DB = os.getenv("WEATHER_HISTORY_DB", "weather_history.db")
+HISTORY_BACKEND = os.getenv("WEATHER_HISTORY_BACKEND", "csv")
+HISTORY_COLUMNS = ['timestamp', 'city', 'temperature_c', 'humidity', 'condition']
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+SNAPSHOT_FILE = os.getenv("WEATHER_SNAPSHOT_FILE", "latest_weather.json")
+SNAPSHOT_MAX_AGE = int(os.getenv("WEATHER_SNAPSHOT_MAX_AGE", "1200"))
+EXPORT_CHUNK_ROWS = 50_000
+# Page boundaries remembered for keyset paging of the raw-data view
+MAX_PAGE_MARKS = 1024
+
+@contextmanager
+def _locked(f):
+    """Hold an exclusive lock on an open file for the duration of the block."""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive cross-process lock on a lock file (created if missing)."""
+    with open(path, "a+b") as f:
+        with _locked(f):
+            yield
+
+def _is_current(f, path):
+    """True if the open file is still the one at `path` (not replaced by a rename)."""
+    try:
+        return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+def make_history_record(city, temp_c, humidity, condition, timestamp=None):
+    """Build one history row in the CSV column order."""
+    timestamp = timestamp or datetime.now()
+    return {
+        'timestamp': timestamp.strftime(TIMESTAMP_FORMAT),
+        'city': city,
+        'temperature_c': temp_c,
+        'humidity': humidity,
+        'condition': condition
+    }
+
+def append_history_records(records, path=HISTORY_FILE):
+    """Append records to the history CSV in a single locked write.
+
+    The existing file is never read back or rewritten, so the cost of a
+    save does not grow with the size of the history.
+    """
+    if not records:
+        return 0
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=HISTORY_COLUMNS, lineterminator=os.linesep)
+    for record in records:
+        writer.writerow({column: record.get(column) for column in HISTORY_COLUMNS})
+    rows = buffer.getvalue()
+
+    while True:
+        with open(path, "a+b") as f:
+            with _locked(f):
+                # Compaction may have renamed a new file into place while we waited
+                if not _is_current(f, path):
+                    continue
+                f.seek(0, os.SEEK_END)
+                size = f.tell()
+                prefix = ""
+                if size == 0:
+                    prefix = ",".join(HISTORY_COLUMNS) + os.linesep
+                else:
+                    # Guard against a file whose last row lacks a trailing newline
+                    f.seek(size - 1)
+                    if f.read(1) not in (b"\n", b"\r"):
+                        prefix = os.linesep
+                payload = (prefix + rows).encode("utf-8")
+                f.write(payload)
+                f.flush()
+                break
+    increment("history_bytes_written", len(payload))
+    increment("history_rows_written", len(records))
+    return len(records)
+
+def records_from_weather_data(weather_data, timestamp=None):
+    """Turn a {city: payload} refresh into history rows.
+
+    Rows are stamped with the API's observation time (`dt`) unless an
+    explicit timestamp is given, so the same observation always maps to
+    the same row.
+    """
+    now = datetime.now()
+    return [
+        make_history_record(
+            city,
+            data['main']['temp'],
+            data['main']['humidity'],
+            data['weather'][0]['main'],
+            timestamp or (datetime.fromtimestamp(data['dt']) if data.get('dt') else now)
+        )
+        for city, data in weather_data.items()
+    ]
+
+# (store epoch, newest timestamp recorded) per (store, city), shared by every session in the process
+_latest_recorded = {}
+_latest_recorded_lock = threading.Lock()
+
+def _forget_recorded(path):
+    """Drop the memo for one store, e.g. after clearing it."""
+    with _latest_recorded_lock:
+        for key in [key for key in _latest_recorded if key[0] == path]:
+            del _latest_recorded[key]
+
+def _stored_latest(store, city):
+    latest = store.latest_n(city, 1)
+    seen = latest['timestamp'].iloc[-1] if not latest.empty else pd.NaT
+    return "" if pd.isna(seen) else seen.strftime(TIMESTAMP_FORMAT)
+
+def record_observations(store, weather_data):
+    """Append only observations newer than what is already stored for each city.
+
+    Several sessions showing the same cached payload therefore write it once.
+    The in-process memo only skips repeats it has already seen; anything that
+    looks new is checked against the store, which the collector and other
+    app processes write to as well, and the memo is dropped once the store
+    is cleared or compacted (its epoch() changes). Returns the number of rows written.
+    """
+    epoch = store.epoch()
+    fresh = []
+    with _latest_recorded_lock:
+        for record in records_from_weather_data(weather_data):
+            key = (getattr(store, "path", None), record['city'])
+            memo = _latest_recorded.get(key)
+            if memo and memo[0] == epoch and record['timestamp'] <= memo[1]:
+                continue
+            latest = _stored_latest(store, record['city'])
+            if record['timestamp'] > latest:
+                fresh.append(record)
+                latest = record['timestamp']
+            _latest_recorded[key] = (epoch, latest)
+    return store.append(fresh)
+
+def load_weather_history(path=HISTORY_FILE):
+    """Load weather history from CSV."""
+    if os.path.exists(path):
+        try:
+            return pd.read_csv(path)
+        except Exception:
+            return pd.DataFrame()
+    return pd.DataFrame()
+
+def clear_weather_history(path=HISTORY_FILE):
+    """Empty the history file without racing concurrent appends.
+
+    An empty file is renamed into place rather than truncating in place, so
+    readers in other processes see a new file and never mistake later
+    appends for a continuation of the old one.
+    """
+    if not os.path.exists(path):
+        return
+    tmp_path = f"{path}.tmp"
+    with open(path, "rb") as f:
+        with _locked(f):
+            open(tmp_path, "wb").close()
+            os.replace(tmp_path, path)
+
+def write_csv_atomic(frame, path):
+    """Replace `path` with `frame` via a temp file and rename, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    frame.to_csv(tmp_path, index=False, date_format=TIMESTAMP_FORMAT, lineterminator=os.linesep)
+    os.replace(tmp_path, path)
+
+def save_latest_snapshot(weather_data, path=SNAPSHOT_FILE):
+    """Merge freshly fetched payloads into the latest-conditions snapshot.
+
+    The file is replaced atomically so the dashboard never reads a partial write.
+    """
+    snapshot = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                snapshot = json.load(f).get("cities", {})
+        except (OSError, ValueError):
+            snapshot = {}
+    fetched_at = time.time()
+    for city, data in weather_data.items():
+        snapshot[city] = {"fetched_at": fetched_at, "data": data}
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"cities": snapshot}, f)
+    os.replace(tmp_path, path)
+
+def load_latest_snapshot(max_age=SNAPSHOT_MAX_AGE, path=SNAPSHOT_FILE):
+    """Return {city: payload} for snapshot entries younger than max_age seconds."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            snapshot = json.load(f).get("cities", {})
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    return {
+        city: entry["data"]
+        for city, entry in snapshot.items()
+        if now - entry.get("fetched_at", 0) <= max_age
+    }
+
+def normalize_timestamps(values):
+    """Parse a mix of date-only and datetime strings; unparseable values become NaT."""
+    text = pd.Series(values, dtype="object").astype(str).str.strip()
+    # Fast vectorised path for the format we write; only stragglers take the slow mixed parser
+    parsed = pd.to_datetime(text, format=TIMESTAMP_FORMAT, errors="coerce")
+    leftover = parsed.isna() & ~text.isin(["", "nan", "None", "NaT"])
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(text[leftover], format="mixed", errors="coerce")
+    return parsed
+
+# ============================================
+# STORAGE BACKENDS
+# ============================================
+# Both backends expose the same methods so the dashboard does not care
+# where history lives. Query results always have a parsed timestamp column.
+
+class CsvHistoryBackend:
+    """History kept in the append-only CSV file.
+
+    The parsed frame is cached and only the bytes appended since the last
+    read are parsed, so repeated queries in a render cost one stat() call.
+    Timestamps are parsed once to datetime64 and city is categorical.
+    Frames returned by load_all() are shared: treat them as read-only.
+    """
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._tiers = {}
+        self._reset()
+
+    def _reset(self):
+        self._frame = self._empty_frame()
+        self._columns = HISTORY_COLUMNS
+        self._offset = 0
+        self._signature = None
+        self._generation = getattr(self, "_generation", 0) + 1
+        self._epoch = getattr(self, "_epoch", 0) + 1
+
+    @staticmethod
+    def _empty_frame():
+        return pd.DataFrame({
+            'timestamp': pd.Series(dtype="datetime64[ns]"),
+            'city': pd.Series(dtype="category"),
+            'temperature_c': pd.Series(dtype="float64"),
+            'humidity': pd.Series(dtype="int64"),
+            'condition': pd.Series(dtype="object")
+        })
+
+    def _parse(self, chunk, has_header):
+        try:
+            if has_header:
+                rows = pd.read_csv(io.BytesIO(chunk))
+                self._columns = list(rows.columns)
+            else:
+                rows = pd.read_csv(io.BytesIO(chunk), header=None, names=self._columns)
+        except pd.errors.EmptyDataError:
+            return None
+        if 'timestamp' in rows:
+            rows['timestamp'] = normalize_timestamps(rows['timestamp']).values
+        return rows
+
+    def _refresh(self):
+        """Bring the cached frame up to date with the file on disk."""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._signature is not None:
+                    self._reset()
+                return self._frame
+
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return self._frame
+            # A replaced or truncated file cannot be read incrementally
+            if self._signature is None or stat.st_ino != self._signature[0] or stat.st_size < self._offset:
+                self._reset()
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read(stat.st_size - self._offset)
+            increment("history_bytes_read", len(chunk))
+            # Only consume complete lines; a trailing partial row is re-read from
+            # the start of its line once the rest of it has been written
+            end = chunk.rfind(b"\n") + 1
+            with timed("history_parse"):
+                rows = self._parse(chunk[:end], has_header=self._offset == 0) if end else None
+            if rows is not None and not rows.empty:
+                increment("history_rows_read", len(rows))
+                if self._frame.empty:
+                    frame = rows
+                else:
+                    frame = pd.concat([self._frame.astype({'city': 'object'}), rows], ignore_index=True)
+                frame['city'] = frame['city'].astype("category")
+                self._frame = frame
+                self._generation += 1
+            self._offset += end
+            self._signature = signature
+            return self._frame
+
+    def generation(self):
+        """Token that changes whenever the stored history changes."""
+        self._refresh()
+        return self._generation
+
+    def epoch(self):
+        """Token that changes only when stored rows are removed or rewritten (clear, compaction).
+
+        Appends leave it alone, so caches built from the rows seen so far
+        may be extended incrementally while it is unchanged.
+        """
+        self._refresh()
+        tiers = []
+        root, ext = os.path.splitext(self.path)
+        for path in sorted(glob.glob(f"{glob.escape(root)}_*{ext}")):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            tiers.append((path, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        return (self._epoch, tuple(tiers))
+
+    def append(self, records):
+        return append_history_records(records, self.path)
+
+    def load_all(self):
+        return self._refresh()
+
+    def latest_n(self, city, n):
+        history = self._refresh()
+        return history[history['city'] == city].tail(n).reset_index(drop=True)
+
+    def range(self, city, start, end):
+        return self._filter(city, start, end).reset_index(drop=True)
+
+    def _filter(self, city=None, start=None, end=None):
+        history = self._refresh()
+        return history[self._mask(history, city, start, end)]
+
+    @staticmethod
+    def _mask(history, city=None, start=None, end=None):
+        mask = pd.Series(True, index=history.index)
+        if city is not None:
+            mask &= history['city'] == city
+        if start is not None:
+            mask &= history['timestamp'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= history['timestamp'] <= pd.Timestamp(end)
+        return mask
+
+    def iter_chunks(self, city=None, start=None, end=None, chunk_size=EXPORT_CHUNK_ROWS):
+        """Yield filtered history in frames of at most chunk_size rows.
+
+        Only the positions of matching rows are computed up front; each chunk
+        is copied out of the shared cached frame as it is yielded, so the
+        filtered result is never materialised as a whole.
+        """
+        history = self._refresh()
+        positions = self._mask(history, city, start, end).to_numpy().nonzero()[0]
+        for offset in range(0, len(positions), chunk_size):
+            yield history.iloc[positions[offset:offset + chunk_size]]
+
+    def page(self, offset, limit, city=None):
+        """Return (rows, total) for one page of history, optionally for one city."""
+        history = self._filter(city)
+        return history.iloc[offset:offset + limit].reset_index(drop=True), len(history)
+
+    def distinct_cities(self):
+        # Sorted, matching the SQLite backend's ORDER BY city
+        return sorted(self._refresh()['city'].dropna().unique())
+
+    def count(self):
+        return len(self._refresh())
+
+    def clear(self):
+        clear_weather_history(self.path)
+        _forget_recorded(self.path)
+        root, ext = os.path.splitext(self.path)
+        for path in glob.glob(f"{glob.escape(root)}_*{ext}"):
+            self.write_tier(path[len(root) + 1:-len(ext) or None], pd.DataFrame())
+
+    # Retention tiers: compacted rollups live next to the raw file
+    # (weather_history_hourly.csv, weather_history_daily.csv, ...)
+    def _tier_path(self, tier):
+        root, ext = os.path.splitext(self.path)
+        return f"{root}_{tier}{ext}"
+
+    def read_tier(self, tier):
+        """Return the compacted rollup rows stored for a retention tier."""
+        path = self._tier_path(tier)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return pd.DataFrame()
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._tiers.get(tier)
+        if cached and cached[0] == signature:
+            return cached[1]
+        try:
+            frame = pd.read_csv(path)
+        except pd.errors.EmptyDataError:
+            frame = pd.DataFrame()
+        if 'timestamp' in frame:
+            frame['timestamp'] = pd.to_datetime(frame['timestamp'], format=TIMESTAMP_FORMAT, errors='coerce')
+        increment("history_rows_read", len(frame))
+        self._tiers[tier] = (signature, frame)
+        return frame
+
+    def write_tier(self, tier, frame):
+        """Atomically replace a retention tier's rollup rows."""
+        path = self._tier_path(tier)
+        if frame.empty:
+            if os.path.exists(path):
+                os.remove(path)
+        else:
+            write_csv_atomic(frame, path)
+        with self._lock:
+            self._tiers.pop(tier, None)
+            self._generation += 1
+
+    def drop_before(self, cutoff):
+        """Delete raw rows older than `cutoff`; returns how many were removed.
+
+        The kept rows are streamed to a temp file that is renamed over the
+        original while appends are locked out, so readers see either the old
+        or the new file and no append is lost.
+        """
+        if not os.path.exists(self.path):
+            return 0
+        cutoff = pd.Timestamp(cutoff)
+        tmp_path = f"{self.path}.tmp"
+        removed = 0
+        with open(self.path, "rb") as f:
+            with _locked(f):
+                with open(tmp_path, "w", newline="") as out:
+                    out.write(",".join(HISTORY_COLUMNS) + os.linesep)
+                    try:
+                        for chunk in pd.read_csv(self.path, chunksize=EXPORT_CHUNK_ROWS, dtype={'timestamp': str}):
+                            # Unparseable timestamps are kept rather than silently dropped
+                            old = (normalize_timestamps(chunk['timestamp']) < cutoff).to_numpy()
+                            removed += int(old.sum())
+                            chunk.loc[~old].reindex(columns=HISTORY_COLUMNS).to_csv(
+                                out, header=False, index=False, lineterminator=os.linesep
+                            )
+                    except pd.errors.EmptyDataError:
+                        pass
+                if removed:
+                    os.replace(tmp_path, self.path)
+        if not removed:
+            os.remove(tmp_path)
+        return removed
+
+class SqliteHistoryBackend:
+    """History in SQLite with a (city, timestamp) index for per-city queries."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        # (city, offset) -> rowid of the row just before that offset, valid for one epoch()
+        self._page_marks = {}
+        self._page_marks_epoch = None
+        self._page_marks_lock = threading.Lock()
+        # (generation, cities): the city list only changes when history does
+        self._cities = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS weather_history (
+                    timestamp TEXT NOT NULL,
+                    city TEXT NOT NULL,
+                    temperature_c REAL,
+                    humidity INTEGER,
+                    condition TEXT
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_city_time ON weather_history (city, timestamp)"
+            )
+            # Cross-city time windows (hot-tier sync, daily stats, compaction) use this one
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_time ON weather_history (timestamp)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the backend safe to share between threads
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _query(self, sql, params=()):
+        with self._connect() as conn:
+            frame = pd.read_sql_query(sql, conn, params=params)
+        increment("history_rows_read", len(frame))
+        frame['timestamp'] = pd.to_datetime(frame['timestamp'], format=TIMESTAMP_FORMAT, errors='coerce')
+        return frame
+
+    def append(self, records):
+        rows = [tuple(record.get(column) for column in HISTORY_COLUMNS) for record in records]
+        if not rows:
+            return 0
+        with self._connect() as conn:
+            conn.executemany("INSERT INTO weather_history VALUES (?, ?, ?, ?, ?)", rows)
+        increment("history_rows_written", len(rows))
+        return len(rows)
+
+    def latest_n(self, city, n):
+        frame = self._query(
+            "SELECT * FROM weather_history WHERE city = ? ORDER BY timestamp DESC LIMIT ?",
+            (city, int(n))
+        )
+        return frame.iloc[::-1].reset_index(drop=True)
+
+    def range(self, city, start, end):
+        return self._query(
+            "SELECT * FROM weather_history WHERE city = ? AND timestamp BETWEEN ? AND ? ORDER BY timestamp",
+            (city, pd.Timestamp(start).strftime(TIMESTAMP_FORMAT), pd.Timestamp(end).strftime(TIMESTAMP_FORMAT))
+        )
+
+    def distinct_cities(self):
+        generation = self.generation()
+        cached = self._cities
+        if cached and cached[0] == generation:
+            return list(cached[1])
+        with self._connect() as conn:
+            cities = [row[0] for row in conn.execute("SELECT DISTINCT city FROM weather_history ORDER BY city")]
+        self._cities = (generation, cities)
+        return list(cities)
+
+    @staticmethod
+    def _where(city=None, start=None, end=None):
+        clauses, params = [], []
+        if city is not None:
+            clauses.append("city = ?")
+            params.append(city)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(pd.Timestamp(start).strftime(TIMESTAMP_FORMAT))
+        if end is not None:
+            clauses.append("timestamp <= ?")
+            params.append(pd.Timestamp(end).strftime(TIMESTAMP_FORMAT))
+        return clauses, params
+
+    def iter_chunks(self, city=None, start=None, end=None, chunk_size=EXPORT_CHUNK_ROWS):
+        """Yield filtered history in frames of at most chunk_size rows (keyset paged by rowid)."""
+        clauses, params = self._where(city, start, end)
+        last_rowid = 0
+        while True:
+            where = " AND ".join(["rowid > ?"] + clauses)
+            frame = self._query(
+                f"SELECT rowid AS _rowid, * FROM weather_history WHERE {where} ORDER BY rowid LIMIT ?",
+                [last_rowid] + params + [chunk_size]
+            )
+            if frame.empty:
+                return
+            last_rowid = int(frame['_rowid'].iloc[-1])
+            yield frame.drop(columns='_rowid')
+
+    def page(self, offset, limit, city=None):
+        """Return (rows, total) for one page of history, optionally for one city.
+
+        Keyset paged by rowid: the last rowid of every page served is kept, so
+        the following page starts at `rowid > ?` instead of an OFFSET scan over
+        all earlier rows. Only a jump to a page never reached that way uses
+        OFFSET. Appends land after every mark, so marks stay valid until rows
+        are removed (a new epoch()).
+        """
+        clauses, params = self._where(city)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        epoch = self.epoch()
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM weather_history {where}", params).fetchone()[0]
+        with self._page_marks_lock:
+            if self._page_marks_epoch != epoch or len(self._page_marks) > MAX_PAGE_MARKS:
+                self._page_marks, self._page_marks_epoch = {}, epoch
+            after = self._page_marks.get((city, offset)) if offset else 0
+        if after is not None:
+            rows = self._query(
+                f"SELECT rowid AS _rowid, * FROM weather_history WHERE {' AND '.join(['rowid > ?'] + clauses)} "
+                "ORDER BY rowid LIMIT ?",
+                [after] + params + [int(limit)]
+            )
+        else:
+            rows = self._query(
+                f"SELECT rowid AS _rowid, * FROM weather_history {where} ORDER BY rowid LIMIT ? OFFSET ?",
+                params + [int(limit), int(offset)]
+            )
+        if not rows.empty:
+            with self._page_marks_lock:
+                if self._page_marks_epoch == epoch:
+                    self._page_marks[(city, offset + len(rows))] = int(rows['_rowid'].iloc[-1])
+        return rows.drop(columns='_rowid'), total
+
+    def count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM weather_history").fetchone()[0]
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM weather_history")
+            for (table,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'weather_history_%'"
+            ).fetchall():
+                conn.execute(f'DELETE FROM "{table}"')
+            self._bump_retention_version(conn)
+        _forget_recorded(self.path)
+
+    def generation(self):
+        """Token that changes whenever the stored history changes.
+
+        MAX(rowid) is one index lookup and moves on every append; every path
+        that deletes rows bumps the retention version, so no COUNT(*) scan
+        is needed.
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT (SELECT MAX(rowid) FROM weather_history), "
+                "(SELECT value FROM meta WHERE key = 'retention_version')"
+            ).fetchone()
+
+    def epoch(self):
+        """Token that changes only when stored rows are removed or rewritten (clear, compaction)."""
+        with self._connect() as conn:
+            version = conn.execute("SELECT value FROM meta WHERE key = 'retention_version'").fetchone()
+        return version[0] if version else None
+
+    # Retention tiers: compacted rollups in weather_history_<tier> tables
+    @staticmethod
+    def _bump_retention_version(conn):
+        conn.execute(
+            "INSERT INTO meta VALUES ('retention_version', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def read_tier(self, tier):
+        """Return the compacted rollup rows stored for a retention tier."""
+        table = f"weather_history_{tier}"
+        with self._connect() as conn:
+            exists = self._has_table(conn, table)
+        if not exists:
+            return pd.DataFrame()
+        return self._query(f'SELECT * FROM "{table}" ORDER BY city, timestamp')
+
+    def write_tier(self, tier, frame):
+        """Atomically replace a retention tier's rollup rows (one transaction)."""
+        table = f"weather_history_{tier}"
+        rows = []
+        if not frame.empty:
+            frame = frame.copy()
+            frame['timestamp'] = frame['timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+            rows = list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
+        with self._connect() as conn:
+            if rows:
+                value_columns = [column for column in frame.columns if column not in ('timestamp', 'city')]
+                columns = ", ".join(f'"{column}" REAL' for column in value_columns)
+                conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS "{table}" (timestamp TEXT NOT NULL, city TEXT NOT NULL, {columns})'
+                )
+            if self._has_table(conn, table):
+                conn.execute(f'DELETE FROM "{table}"')
+            if rows:
+                placeholders = ", ".join("?" * len(frame.columns))
+                names = ", ".join(f'"{column}"' for column in frame.columns)
+                conn.executemany(f'INSERT INTO "{table}" ({names}) VALUES ({placeholders})', rows)
+            self._bump_retention_version(conn)
+        increment("history_rows_written", len(rows))
+
+    @staticmethod
+    def _has_table(conn, table):
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone() is not None
+
+    def drop_before(self, cutoff):
+        """Delete raw rows older than `cutoff`; returns how many were removed."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM weather_history WHERE timestamp < ?",
+                (pd.Timestamp(cutoff).strftime(TIMESTAMP_FORMAT),)
+            )
+            if cursor.rowcount:
+                self._bump_retention_version(conn)
+            return cursor.rowcount
+
+    def migrate_from_csv(self, csv_path=HISTORY_FILE):
+        """Import the legacy CSV once, normalising its mixed timestamp formats.
+
+        Returns the number of rows imported (0 if already migrated).
+        """
+        with self._connect() as conn:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'csv_migrated'").fetchone()
+        if done or not os.path.exists(csv_path):
+            return 0
+
+        legacy = load_weather_history(csv_path)
+        imported = 0
+        if not legacy.empty:
+            legacy = legacy.reindex(columns=HISTORY_COLUMNS)
+            legacy['timestamp'] = normalize_timestamps(legacy['timestamp'])
+            legacy = legacy.dropna(subset=['timestamp', 'city'])
+            legacy['timestamp'] = legacy['timestamp'].dt.strftime(TIMESTAMP_FORMAT)
+            legacy = legacy.astype(object).where(legacy.notna(), None)
+            imported = self.append(legacy.to_dict('records'))
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('csv_migrated', ?)",
+                (datetime.now().strftime(TIMESTAMP_FORMAT),)
+            )
+        return imported
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def open_history_store(backend=HISTORY_BACKEND):
+    """Return the configured history backend ("csv" or "sqlite").
+
+    Instances are shared across reruns and sessions so their caches survive.
+    """
+    with _stores_lock:
+        store = _stores.get(backend)
+        if store is None:
+            if backend == "sqlite":
+                store = SqliteHistoryBackend()
+                store.migrate_from_csv()
+            else:
+                store = CsvHistoryBackend()
+            _stores[backend] = store
+        return store
@@ -0,0 +1,311 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from conditions import condition_code, conditions_from_codes
+from lazy import lazy_import
+from metrics import increment, registry
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ============================================
+# IN-MEMORY HOT TIER
+# ============================================
+# Samples kept per city: a week of 10-minute observations, with headroom
+HOT_TIER_CAPACITY = int(os.getenv("WEATHER_HOT_TIER_SIZE", "2048"))
+# History loaded into the tier when the process first syncs with the store
+HOT_TIER_WINDOW = timedelta(days=float(os.getenv("WEATHER_HOT_TIER_DAYS", "7")))
+# Later syncs re-read this far behind the newest synced row: observation times
+# of different cities interleave, so a newly stored row can be a little older
+SYNC_OVERLAP = timedelta(hours=1)
+
+def _seconds(timestamp):
+    return np.datetime64(pd.Timestamp(timestamp).to_datetime64(), 's')
+
+class CityRing:
+    """Fixed-size ring of one city's newest observations in parallel NumPy arrays.
+
+    Appends are O(1) and never allocate. `covers_since` is the earliest time
+    from which the ring holds every stored sample of the city, so readers
+    can tell whether a window is answerable without the history store.
+    Conditions are kept twice: the canonical group code, and an index into
+    the tier's vocabulary of stored condition texts ("Light Rain").
+    """
+
+    __slots__ = ('timestamps', 'temperature', 'humidity', 'pressure', 'wind_speed', 'condition',
+                 'condition_text', 'capacity', 'head', 'size', 'covers_since')
+
+    def __init__(self, capacity, covers_since):
+        self.timestamps = np.zeros(capacity, dtype='datetime64[s]')
+        self.temperature = np.full(capacity, np.nan, dtype='float32')
+        self.humidity = np.full(capacity, np.nan, dtype='float32')
+        self.pressure = np.full(capacity, np.nan, dtype='float32')
+        self.wind_speed = np.full(capacity, np.nan, dtype='float32')
+        self.condition = np.zeros(capacity, dtype='int8')
+        self.condition_text = np.zeros(capacity, dtype='int32')
+        self.capacity = capacity
+        self.head = 0
+        self.size = 0
+        self.covers_since = covers_since
+
+    def last_timestamp(self):
+        return self.timestamps[(self.head - 1) % self.capacity] if self.size else None
+
+    def append(self, timestamp, temperature, humidity, pressure, wind_speed, code, text):
+        """Add one sample; samples not newer than the last one are ignored."""
+        if self.size and timestamp <= self.timestamps[(self.head - 1) % self.capacity]:
+            return False
+        i = self.head
+        if self.size == self.capacity:
+            # The oldest sample is overwritten, so coverage now starts at the next one
+            self.covers_since = self.timestamps[(i + 1) % self.capacity]
+        self.timestamps[i] = timestamp
+        self.temperature[i] = temperature
+        self.humidity[i] = humidity
+        self.pressure[i] = pressure
+        self.wind_speed[i] = wind_speed
+        self.condition[i] = code
+        self.condition_text[i] = text
+        self.head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return True
+
+    def extend(self, timestamps, temperature, humidity, pressure, wind_speed, codes, texts):
+        """Bulk append of samples sorted by time; returns how many were added."""
+        if not len(timestamps):
+            return 0
+        keep = np.concatenate([[True], timestamps[1:] > timestamps[:-1]])
+        if self.size:
+            keep &= timestamps > self.last_timestamp()
+        columns = [
+            np.asarray(column)[keep]
+            for column in (timestamps, temperature, humidity, pressure, wind_speed, codes, texts)
+        ]
+        added = len(columns[0])
+        if not added:
+            return 0
+        if self.size + added > self.capacity:
+            ordered = np.concatenate([self.timestamps[self._order()], columns[0]])
+            self.covers_since = ordered[-self.capacity]
+        fits = min(added, self.capacity)
+        slots = (self.head + added - fits + np.arange(fits)) % self.capacity
+        for target, values in zip(self._columns(), columns):
+            target[slots] = values[-fits:]
+        self.head = (self.head + added) % self.capacity
+        self.size = min(self.size + added, self.capacity)
+        return added
+
+    def _columns(self):
+        return (self.timestamps, self.temperature, self.humidity, self.pressure, self.wind_speed,
+                self.condition, self.condition_text)
+
+    def _order(self):
+        """Slot indices from oldest to newest sample."""
+        return (self.head - self.size + np.arange(self.size)) % self.capacity
+
+    def frame(self, texts, start=None, n=None):
+        """Samples since `start` (or the newest `n`) as a history-shaped frame.
+
+        `texts` is the vocabulary condition_text indexes into; like the store,
+        `condition` holds the stored text and `condition_group` its group.
+        """
+        order = self._order()
+        if start is not None:
+            order = order[np.searchsorted(self.timestamps[order], _seconds(start)):]
+        if n is not None:
+            order = order[-n:] if n else order[:0]
+        groups = conditions_from_codes(self.condition[order])
+        return pd.DataFrame({
+            'timestamp': self.timestamps[order].astype('datetime64[ns]'),
+            'temperature_c': self.temperature[order].astype('float64'),
+            'humidity': self.humidity[order].astype('float64'),
+            'pressure': self.pressure[order].astype('float64'),
+            'wind_speed': self.wind_speed[order].astype('float64'),
+            'condition': texts[self.condition_text[order]],
+            'condition_group': groups,
+        })
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._columns())
+
+class HotTier:
+    """Recent observations of every city, kept in process memory.
+
+    Filled as observations are recorded and kept in step with the history
+    store (including rows written by other processes, e.g. the collector)
+    by sync(), which reads only rows newer than what it has already seen.
+    Memory is bounded by HOT_TIER_CAPACITY samples per city.
+    """
+
+    def __init__(self, capacity=HOT_TIER_CAPACITY, window=HOT_TIER_WINDOW):
+        self.capacity = capacity
+        self.window = window
+        self._rings = {}
+        # Distinct stored condition texts; rings hold indexes into this list
+        self._texts = []
+        self._text_index = {}
+        self._text_array = np.array([], dtype=object)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._reset_sync(None)
+
+    def _reset_sync(self, store, epoch=None):
+        self._store = store
+        self._epoch = epoch
+        self._generation = None
+        self._synced_until = None
+        self._covers_since = None
+
+    def _ring(self, city, first_timestamp):
+        ring = self._rings.get(city)
+        if ring is None:
+            # After a sync the store had nothing for this city since the warm start
+            covers_since = self._covers_since if self._covers_since is not None else first_timestamp
+            ring = self._rings[city] = CityRing(self.capacity, covers_since)
+        return ring
+
+    def _text_code(self, text):
+        """Vocabulary index of a condition text (caller holds the lock)."""
+        code = self._text_index.get(text)
+        if code is None:
+            code = self._text_index[text] = len(self._texts)
+            self._texts.append(text)
+            self._text_array = np.array(self._texts, dtype=object)
+        return code
+
+    def _frame(self, ring, start=None, n=None):
+        return ring.frame(self._text_array, start=start, n=n)
+
+    def record(self, weather_data):
+        """Add a {city: payload} refresh; stamps match records_from_weather_data()."""
+        now = datetime.now()
+        added = 0
+        with self._lock:
+            for city, data in weather_data.items():
+                timestamp = _seconds(datetime.fromtimestamp(data['dt']) if data.get('dt') else now)
+                weather = data['weather'][0]
+                ring = self._ring(city, timestamp)
+                added += ring.append(
+                    timestamp, data['main']['temp'], data['main']['humidity'],
+                    data['main'].get('pressure', np.nan), data.get('wind', {}).get('speed', np.nan),
+                    condition_code(weather.get('id') or weather['main']), self._text_code(weather['main'])
+                )
+        increment("hot_tier_samples_added", added)
+        return added
+
+    def _extend(self, history):
+        """Add history rows (timestamp, city, temperature_c, humidity, condition[, pressure, wind_speed])."""
+        history = history.dropna(subset=['timestamp'])
+        if history.empty:
+            return 0
+        history = history.sort_values('timestamp', kind='stable')
+        # Classify and intern each distinct condition text once
+        text_codes, uniques = pd.factorize(history['condition'].astype(object).where(history['condition'].notna(), ""))
+        group_lookup = np.array([condition_code(raw) for raw in uniques], dtype='int8')
+        codes = group_lookup[text_codes]
+        timestamps = history['timestamp'].to_numpy().astype('datetime64[s]')
+        missing = np.full(len(history), np.nan)
+        columns = {
+            'temperature': history['temperature_c'].to_numpy(dtype='float64'),
+            'humidity': history['humidity'].to_numpy(dtype='float64'),
+            'pressure': history['pressure'].to_numpy(dtype='float64') if 'pressure' in history else missing,
+            'wind_speed': history['wind_speed'].to_numpy(dtype='float64') if 'wind_speed' in history else missing,
+        }
+        cities = history['city'].astype(str).to_numpy()
+        added = 0
+        with self._lock:
+            texts = np.array([self._text_code(text) for text in uniques], dtype='int32')[text_codes]
+            for city in pd.unique(cities):
+                rows = cities == city
+                ring = self._ring(city, timestamps[rows][0])
+                added += ring.extend(
+                    timestamps[rows], columns['temperature'][rows], columns['humidity'][rows],
+                    columns['pressure'][rows], columns['wind_speed'][rows], codes[rows], texts[rows]
+                )
+        return added
+
+    def sync(self, store):
+        """Pull rows the store gained since the last sync; the first call warms the tier.
+
+        Cheap when nothing changed: one generation() check. When rows were
+        removed (cleared or compacted, by any process: see store.epoch()) the
+        tier is dropped and warmed again, so deleted samples are not served.
+        """
+        generation = store.generation()
+        if store is self._store and generation == self._generation:
+            return 0
+        with self._sync_lock:
+            epoch = store.epoch()
+            if store is not self._store or epoch != self._epoch:
+                self.clear()
+                self._reset_sync(store, epoch)
+            elif generation == self._generation:
+                return 0
+            if self._synced_until is None:
+                start = datetime.now() - self.window
+                self._covers_since = _seconds(start)
+            else:
+                start = self._synced_until - SYNC_OVERLAP
+            added = 0
+            for chunk in store.iter_chunks(start=start):
+                added += self._extend(chunk)
+                newest = chunk['timestamp'].max()
+                if pd.notna(newest) and (self._synced_until is None or newest > self._synced_until):
+                    self._synced_until = newest.to_pydatetime()
+            if self._synced_until is None:
+                self._synced_until = datetime.now() - self.window
+            self._generation = generation
+        increment("hot_tier_samples_synced", added)
+        self._publish()
+        return added
+
+    def clear(self):
+        with self._lock:
+            self._rings.clear()
+            self._texts, self._text_index = [], {}
+            self._text_array = np.array([], dtype=object)
+            self._generation = None
+
+    def last_timestamp(self, city):
+        with self._lock:
+            ring = self._rings.get(city)
+            last = ring.last_timestamp() if ring is not None else None
+        return pd.Timestamp(last) if last is not None else None
+
+    def latest(self, city, n):
+        """Newest `n` samples of a city, oldest first, or None if fewer than `n` are in memory.
+
+        The store may hold older samples than the warm window, so a short ring is not the full answer.
+        """
+        with self._lock:
+            ring = self._rings.get(city)
+            return self._frame(ring, n=n) if ring is not None and ring.size >= n else None
+
+    def since(self, city, start):
+        """Samples of a city from `start` on, or None unless the ring holds all of them."""
+        with self._lock:
+            ring = self._rings.get(city)
+            if ring is None or not ring.size or ring.covers_since > _seconds(start):
+                return None
+            return self._frame(ring, start=start)
+
+    def stats(self):
+        with self._lock:
+            cities = len(self._rings)
+            samples = sum(ring.size for ring in self._rings.values())
+            total = sum(ring.nbytes for ring in self._rings.values())
+        return {
+            'cities': cities,
+            'samples': samples,
+            'bytes': total,
+            'bytes_per_city': total // cities if cities else 0,
+        }
+
+    def _publish(self):
+        stats = self.stats()
+        registry.set_gauge("hot_tier_bytes", stats['bytes'])
+        registry.set_gauge("hot_tier_samples", stats['samples'])
+
+hot_tier = HotTier()
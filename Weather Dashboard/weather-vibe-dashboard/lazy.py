@@ -0,0 +1,35 @@
+import importlib
+import threading
+
+# ============================================
+# DEFERRED IMPORTS
+# ============================================
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    After the import the module's namespace is copied onto the proxy, so
+    later lookups are plain attribute reads.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_lazy_name'] = name
+        self.__dict__['_lazy_lock'] = threading.Lock()
+
+    def _lazy_load(self):
+        with self._lazy_lock:
+            if '_lazy_module' not in self.__dict__:
+                module = importlib.import_module(self._lazy_name)
+                self.__dict__.update(module.__dict__)
+                self.__dict__['_lazy_module'] = module
+        return self.__dict__['_lazy_module']
+
+    def __getattr__(self, attr):
+        return getattr(self._lazy_load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if '_lazy_module' in self.__dict__ else "not loaded"
+        return f"<lazy module {self._lazy_name!r} ({state})>"
+
+def lazy_import(name):
+    """Return a proxy for module `name` that defers the import until it is used."""
+    return LazyModule(name)
@@ -0,0 +1,88 @@
+import os
+
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ============================================
+# GRID CLUSTERING FOR THE MAP
+# ============================================
+# Upper bound on markers sent to the browser, whatever the detail level
+MAX_MARKERS = int(os.getenv("WEATHER_MAP_MAX_MARKERS", "200"))
+# Level n splits the globe into cells of 360 / 2**n degrees; 12 is about 10 km
+MAX_LEVEL = 12
+# City names listed in a cluster's hover text before "+N more"
+LABEL_NAMES = 3
+
+CLUSTER_COLUMNS = ['lat', 'lon', 'count', 'condition', 'temperature', 'label',
+                   'lat_min', 'lat_max', 'lon_min', 'lon_max']
+
+def cell_keys(lat, lon, level):
+    """One integer per point identifying its grid cell at `level`."""
+    cell = 360.0 / 2 ** level
+    columns = int(np.ceil(360.0 / cell)) + 1
+    x = np.floor((np.asarray(lon, dtype='float64') + 180.0) / cell).astype('int64')
+    y = np.floor((np.asarray(lat, dtype='float64') + 90.0) / cell).astype('int64')
+    return y * columns + x
+
+def auto_level(lat, lon, max_markers=MAX_MARKERS):
+    """Finest level whose occupied cells still fit in `max_markers`."""
+    best = 0
+    for level in range(MAX_LEVEL + 1):
+        if len(np.unique(cell_keys(lat, lon, level))) > max_markers:
+            break
+        best = level
+    return best
+
+def _label(names, count):
+    shown = ", ".join(names[:LABEL_NAMES])
+    return shown if count <= LABEL_NAMES else f"{shown} +{count - LABEL_NAMES} more"
+
+def in_bounds(frame, bounds):
+    """Rows of a frame with lat/lon inside (lat_min, lat_max, lon_min, lon_max)."""
+    lat_min, lat_max, lon_min, lon_max = bounds
+    return frame[frame['lat'].between(lat_min, lat_max) & frame['lon'].between(lon_min, lon_max)]
+
+def cluster_cities(frame, level=None, max_markers=MAX_MARKERS, bounds=None):
+    """Group a city-indexed frame (lat, lon, condition_group, temperature) into grid clusters.
+
+    Returns (clusters, level). `level` is coarsened when it would produce more
+    than `max_markers` clusters, so the marker count stays bounded. Each
+    cluster sits at the mean position of its cities, takes their most common
+    condition and carries their bounding box; passing a cluster's box as
+    `bounds` re-clusters just that region, which is how the map zooms in.
+    """
+    points = frame.dropna(subset=['lat', 'lon'])
+    if bounds is not None:
+        points = in_bounds(points, bounds)
+    if points.empty:
+        return pd.DataFrame(columns=CLUSTER_COLUMNS), 0
+    lat = points['lat'].to_numpy()
+    lon = points['lon'].to_numpy()
+    finest = auto_level(lat, lon, max_markers)
+    level = finest if level is None else max(0, min(level, finest))
+
+    cells = pd.DataFrame({
+        'cell': cell_keys(lat, lon, level),
+        'lat': lat,
+        'lon': lon,
+        'condition': points['condition_group'].astype(str).to_numpy(),
+        'temperature': points['temperature'].to_numpy(dtype='float64'),
+        'city': points.index.astype(str),
+    })
+    grouped = cells.groupby('cell', sort=False)
+    clusters = grouped.agg(
+        lat=('lat', 'mean'), lon=('lon', 'mean'), count=('city', 'size'), temperature=('temperature', 'mean'),
+        lat_min=('lat', 'min'), lat_max=('lat', 'max'), lon_min=('lon', 'min'), lon_max=('lon', 'max'),
+    )
+    # Most common condition per cell (ties go to the first seen)
+    dominant = (cells.groupby(['cell', 'condition'], sort=False).size()
+                .reset_index(name='cities')
+                .sort_values('cities', ascending=False, kind='stable')
+                .drop_duplicates('cell')
+                .set_index('cell')['condition'])
+    clusters['condition'] = dominant.reindex(clusters.index).to_numpy()
+    names = grouped['city'].agg(list)
+    clusters['label'] = [_label(city_names, count) for city_names, count in zip(names, clusters['count'])]
+    return clusters.reset_index(drop=True)[CLUSTER_COLUMNS], level
@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ============================================
+# TIMING & COUNTERS
+# ============================================
+# Optional Prometheus textfile (e.g. for node_exporter's textfile collector)
+METRICS_FILE = os.getenv("WEATHER_METRICS_FILE") or None
+# Level for the per-render JSON log lines (e.g. INFO); unset keeps them off
+METRICS_LOG = os.getenv("WEATHER_METRICS_LOG") or None
+
+logger = logging.getLogger("weather_metrics")
+if METRICS_LOG and not logger.handlers:
+    # Streamlit doesn't configure logging for app modules, so attach our own handler
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(METRICS_LOG.upper())
+    logger.propagate = False
+
+class MetricsRegistry:
+    """Process-wide counters and per-stage timing totals, shared by all sessions."""
+
+    def __init__(self):
+        self.counters = {}
+        self.stages = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def gauge_snapshot(self):
+        with self._lock:
+            return dict(self.gauges)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters), dict(self.stages)
+
+    def to_prometheus(self):
+        """Render counters and stage timings in the Prometheus text format."""
+        counters, stages = self.snapshot()
+        lines = []
+        for name, value in sorted(counters.items()):
+            lines.append(f"# TYPE weather_{name}_total counter")
+            lines.append(f"weather_{name}_total {value}")
+        for name, value in sorted(self.gauge_snapshot().items()):
+            lines.append(f"# TYPE weather_{name} gauge")
+            lines.append(f"weather_{name} {value:.6f}")
+        if stages:
+            lines.append("# TYPE weather_stage_seconds summary")
+            for stage, (count, total, _) in sorted(stages.items()):
+                lines.append(f'weather_stage_seconds_sum{{stage="{stage}"}} {total:.6f}')
+                lines.append(f'weather_stage_seconds_count{{stage="{stage}"}} {count}')
+            lines.append("# TYPE weather_stage_seconds_max gauge")
+            for stage, (_, _, longest) in sorted(stages.items()):
+                lines.append(f'weather_stage_seconds_max{{stage="{stage}"}} {longest:.6f}')
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+_current = threading.local()
+
+class RenderTimings:
+    """Spans and counter deltas for a single script run (one page render)."""
+
+    def __init__(self, started=None):
+        self.started = started if started is not None else time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "total_s": round(self.elapsed(), 6),
+            "spans": [{"stage": stage, "seconds": round(seconds, 6)} for stage, seconds in self.spans],
+            "counters": dict(self.counters),
+        }
+
+def start_render(started=None):
+    """Begin collecting spans for the current thread's render (optionally backdated to `started`)."""
+    _current.render = RenderTimings(started)
+    return _current.render
+
+def current_render():
+    return getattr(_current, "render", None)
+
+def bind_render(fn):
+    """Wrap fn so worker threads attribute their counters to the caller's render."""
+    render = current_render()
+
+    def wrapper(*args, **kwargs):
+        _current.render = render
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.render = None
+    return wrapper
+
+def increment(name, value=1):
+    """Bump a process-wide counter and the current render's copy of it."""
+    registry.increment(name, value)
+    render = current_render()
+    if render is not None:
+        render.add(name, value)
+
+def record_span(stage, seconds):
+    """Record an already-measured span globally and on the current render."""
+    registry.observe(stage, seconds)
+    render = current_render()
+    if render is not None:
+        render.spans.append((stage, seconds))
+
+@contextmanager
+def timed(stage):
+    """Time a block, recording it globally and on the current render."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(stage, time.perf_counter() - started)
+
+_cold_start_lock = threading.Lock()
+
+def _record_cold_start(render):
+    """Keep the first render's import and total time as cold-start gauges."""
+    with _cold_start_lock:
+        if "cold_start_render_seconds" in registry.gauges:
+            return
+        imports = sum(seconds for stage, seconds in render.spans if stage == "imports")
+        registry.set_gauge("cold_start_import_seconds", imports)
+        registry.set_gauge("cold_start_render_seconds", render.elapsed())
+
+def finish_render(render):
+    """Emit the render as a structured log line and refresh the metrics file."""
+    _record_cold_start(render)
+    logger.info(json.dumps({"event": "render", **render.as_dict()}))
+    if METRICS_FILE:
+        write_metrics_file(METRICS_FILE)
+
+def write_metrics_file(path):
+    """Atomically replace `path` with the current metrics; safe across sessions and processes."""
+    # Imported here: history_store itself imports this module
+    from history_store import file_lock
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with file_lock(f"{path}.lock"):
+        with open(tmp_path, "w") as f:
+            f.write(registry.to_prometheus())
+        os.replace(tmp_path, path)
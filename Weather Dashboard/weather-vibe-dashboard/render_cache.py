@@ -0,0 +1,46 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from metrics import increment
+
+# ============================================
+# RENDER MEMOISATION
+# ============================================
+RENDER_CACHE_SIZE = 512
+
+def payload_fingerprint(data):
+    """Cheap identity for an API payload: city id + observation time, or a content hash."""
+    if data.get('id') is not None and data.get('dt') is not None:
+        return (data['id'], data['dt'])
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+class RenderCache:
+    """Bounded LRU of built UI components (card HTML, figures) keyed on their inputs.
+
+    Entries are shared across sessions, so cached objects must be treated as
+    read-only by callers.
+    """
+
+    def __init__(self, max_entries=RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                increment("render_cache_hits")
+                return self._entries[key]
+        increment("render_cache_misses")
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+render_cache = RenderCache()
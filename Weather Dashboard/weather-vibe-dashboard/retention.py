@@ -0,0 +1,138 @@
+"""History retention and compaction.
+
+Raw observations are kept for a limited time, then rolled up into coarser
+tiers that are kept longer. The default policy keeps raw samples for 7
+days, hourly rollups for 90 days and daily rollups forever, so storage and
+trend query cost stay bounded however long the collector runs:
+
+    python retention.py                 # compact once with the configured policy
+    python retention.py --dry-run       # report what would be compacted
+
+Every step writes its new tier before removing the source rows, and each
+write is atomic (temp file + rename, or one SQLite transaction). Buckets
+already present in a tier are never aggregated twice, so an interrupted
+run is simply finished by the next one. The collector runs this
+periodically; see COMPACT_INTERVAL in collector.py.
+"""
+import argparse
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from history_store import open_history_store
+from lazy import lazy_import
+from metrics import increment, timed
+from trends import combine_rollups, rollup_by_city
+
+pd = lazy_import("pandas")
+
+# ============================================
+# RETENTION POLICY
+# ============================================
+# name: tier storage name; freq: bucket size (None = raw samples); keep: age limit (None = forever)
+RetentionTier = namedtuple("RetentionTier", "name freq keep")
+
+def _days(variable, default):
+    value = os.getenv(variable, default).strip().lower()
+    return None if value in ("", "none", "forever") else timedelta(days=float(value))
+
+RETENTION_POLICY = [
+    RetentionTier("raw", None, _days("WEATHER_RAW_RETENTION_DAYS", "7")),
+    RetentionTier("hourly", "60min", _days("WEATHER_HOURLY_RETENTION_DAYS", "90")),
+    RetentionTier("daily", "D", _days("WEATHER_DAILY_RETENTION_DAYS", "forever")),
+]
+
+logger = logging.getLogger("weather_retention")
+
+def _one_second_before(cutoff):
+    # History timestamps have second resolution and store range ends are inclusive
+    return cutoff - pd.Timedelta(seconds=1)
+
+def _not_yet_compacted(fresh, existing, freq):
+    """Drop buckets of `fresh` that end before the newest bucket already in `existing` (per city)."""
+    if existing.empty or fresh.empty:
+        return fresh
+    watermark = existing.groupby('city')['timestamp'].max() + pd.tseries.frequencies.to_offset(freq)
+    limit = fresh['city'].map(watermark)
+    return fresh[limit.isna() | (fresh['timestamp'] >= limit)]
+
+def _read_source(store, tier, cutoff, target_freq):
+    """Rollups of everything in `tier` older than `cutoff`, at `target_freq`, plus the row count read."""
+    if tier.freq is None:
+        partials = []
+        rows = 0
+        for chunk in store.iter_chunks(end=_one_second_before(cutoff)):
+            rows += len(chunk)
+            partials.append(rollup_by_city(chunk, target_freq))
+        if not partials:
+            return pd.DataFrame(), 0
+        # Chunks can split a bucket; combining folds the partial buckets together
+        return combine_rollups(pd.concat(partials, ignore_index=True), target_freq), rows
+
+    rows = store.read_tier(tier.name)
+    if rows.empty:
+        return pd.DataFrame(), 0
+    old = rows[rows['timestamp'] < cutoff]
+    return combine_rollups(old, target_freq), len(old)
+
+def _remove_source(store, tier, cutoff):
+    if tier.freq is None:
+        return store.drop_before(cutoff)
+    rows = store.read_tier(tier.name)
+    if rows.empty:
+        return 0
+    kept = rows[rows['timestamp'] >= cutoff]
+    if len(kept) < len(rows):
+        store.write_tier(tier.name, kept)
+    return len(rows) - len(kept)
+
+def compact(store=None, policy=None, now=None, dry_run=False):
+    """Apply the retention policy once; returns {tier name: rows moved out of it}."""
+    store = store or open_history_store()
+    policy = policy or RETENTION_POLICY
+    now = pd.Timestamp(now or datetime.now())
+    summary = {}
+
+    for source, target in zip(policy, policy[1:]):
+        if source.keep is None:
+            break
+        # Cut on a target bucket boundary so no bucket is split between tiers
+        cutoff = (now - source.keep).floor(target.freq)
+        with timed(f"compact:{source.name}"):
+            fresh, rows = _read_source(store, source, cutoff, target.freq)
+            if dry_run:
+                summary[source.name] = rows
+                continue
+            existing = store.read_tier(target.name)
+            fresh = _not_yet_compacted(fresh, existing, target.freq)
+            if not fresh.empty:
+                merged = pd.concat([existing, fresh], ignore_index=True) if not existing.empty else fresh
+                store.write_tier(target.name, merged.sort_values(['city', 'timestamp'], ignore_index=True))
+            # Only after the rollups are safely written
+            summary[source.name] = _remove_source(store, source, cutoff)
+        increment("history_rows_compacted", summary[source.name])
+
+    last = policy[-1]
+    if last.keep is not None and last.freq is not None:
+        cutoff = (now - last.keep).floor(last.freq)
+        summary[last.name] = 0 if dry_run else _remove_source(store, last, cutoff)
+
+    logger.info("Compaction %s", ", ".join(f"{name}: {rows} rows" for name, rows in summary.items()))
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact weather history according to the retention policy.")
+    parser.add_argument("--dry-run", action="store_true", help="report rows that would be compacted")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    for tier in RETENTION_POLICY:
+        kept = f"{tier.keep / timedelta(days=1):g} days" if tier.keep else "forever"
+        print(f"{tier.name:>8}: {tier.freq or 'raw samples'}, kept {kept}")
+    summary = compact(dry_run=args.dry_run)
+    for name, rows in summary.items():
+        print(f"{name:>8}: {rows} rows {'would be ' if args.dry_run else ''}compacted")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Local stand-in for the OpenWeatherMap API, for benchmarks and manual testing.
+
+Any city name resolves to a deterministic fake payload. Latency and an
+error rate can be injected to mimic a slow or flaky upstream:
+
+    python stub_server.py --port 8080 --latency 0.2 --error-rate 0.05
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8080/data/2.5 streamlit run app.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CONDITIONS = ["Clear", "Clouds", "Rain", "Drizzle", "Thunderstorm", "Snow", "Mist"]
+
+def city_id(name):
+    """Stable fake OpenWeatherMap id for a city name."""
+    return zlib.crc32(name.strip().lower().encode()) % 9_000_000 + 1_000_000
+
+def fake_weather(name, cid=None):
+    cid = cid or city_id(name)
+    rng = random.Random(cid)
+    return {
+        "id": cid,
+        "name": name.strip().title(),
+        "coord": {"lat": round(rng.uniform(-60, 70), 2), "lon": round(rng.uniform(-180, 180), 2)},
+        "weather": [{"id": 800, "main": rng.choice(CONDITIONS), "description": "stub"}],
+        "main": {
+            "temp": round(rng.uniform(-10, 35), 1),
+            "feels_like": round(rng.uniform(-12, 38), 1),
+            "humidity": rng.randint(20, 100),
+            "pressure": rng.randint(980, 1040)
+        },
+        "wind": {"speed": round(rng.uniform(0, 15), 1)},
+        "sys": {"country": "XX"},
+        "dt": int(time.time())
+    }
+
+def fake_forecast(name, steps=40):
+    """Deterministic 3-hourly forecast for a city, starting at the next 3-hour boundary."""
+    current = fake_weather(name)
+    rng = random.Random(current["id"] + 1)
+    start = int(time.time()) // 10800 * 10800 + 10800
+    entries = []
+    for step in range(steps):
+        entries.append({
+            "dt": start + step * 10800,
+            "main": {
+                "temp": round(current["main"]["temp"] + rng.uniform(-4, 4), 1),
+                "humidity": min(100, max(0, current["main"]["humidity"] + rng.randint(-15, 15))),
+                "pressure": current["main"]["pressure"]
+            },
+            "weather": [{"id": 800, "main": rng.choice(CONDITIONS), "description": "stub"}],
+            "pop": round(rng.random(), 2)
+        })
+    return {"cod": "200", "cnt": steps, "list": entries, "city": {"id": current["id"], "name": current["name"]}}
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+    names_by_id = {}
+    request_count = 0
+    _lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        with StubHandler._lock:
+            StubHandler.request_count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            return self._send(503, {"cod": 503, "message": "stub failure"})
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path.endswith("/weather") and "q" in query:
+            name = query["q"][0]
+            if name.lower().startswith("nowhere"):
+                return self._send(404, {"cod": "404", "message": "city not found"})
+            self.names_by_id[city_id(name)] = name
+            return self._send(200, fake_weather(name))
+        if url.path.endswith("/weather") and "id" in query:
+            cid = int(query["id"][0])
+            return self._send(200, fake_weather(self.names_by_id.get(cid, str(cid)), cid))
+        if url.path.endswith("/forecast") and "q" in query:
+            name = query["q"][0]
+            if name.lower().startswith("nowhere"):
+                return self._send(404, {"cod": "404", "message": "city not found"})
+            return self._send(200, fake_forecast(name))
+        if url.path.endswith("/forecast") and "id" in query:
+            cid = int(query["id"][0])
+            return self._send(200, fake_forecast(self.names_by_id.get(cid, str(cid))))
+        if url.path.endswith("/group") and "id" in query:
+            ids = [int(value) for value in query["id"][0].split(",") if value]
+            items = [fake_weather(self.names_by_id.get(cid, str(cid)), cid) for cid in ids]
+            return self._send(200, {"cnt": len(items), "list": items})
+        return self._send(404, {"cod": "404", "message": "unknown endpoint"})
+
+def start_stub_server(port=0, latency=0.0, error_rate=0.0):
+    """Start the stub in a background thread; returns (server, base_url)."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"latency": latency, "error_rate": error_rate})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/data/2.5"
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenWeatherMap stub.")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.port, args.latency, args.error_rate)
+    print(f"Stub OpenWeatherMap API at {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from datetime import datetime, timedelta
+
+from alerts import AlertEngine
+from history_store import make_history_record, records_from_weather_data
+
+NOW = datetime(2026, 1, 15, 12, 0, 0)
+
+def thunderstorm_alerts(fired):
+    return [alert for alert in fired if alert.rule.startswith("condition_")]
+
+def test_restart_does_not_refire_current_condition(store, payload):
+    # Before the restart: the storm was observed, recorded and alerted on
+    store.append(records_from_weather_data({"Oslo": payload(NOW - timedelta(minutes=20), "Clear")}))
+    store.append(records_from_weather_data({"Oslo": payload(NOW - timedelta(minutes=10), "Thunderstorm")}))
+
+    engine = AlertEngine()
+    assert engine.prime_from_store(store, ["Oslo"]) == 2
+    # The same observation served again, then a newer one with the storm still going
+    assert thunderstorm_alerts(engine.observe_weather_data({"Oslo": payload(NOW - timedelta(minutes=10), "Thunderstorm")})) == []
+    assert thunderstorm_alerts(engine.observe_weather_data({"Oslo": payload(NOW, "Thunderstorm")})) == []
+
+def test_primed_engine_still_fires_on_new_change(store, payload):
+    store.append(records_from_weather_data({"Oslo": payload(NOW - timedelta(minutes=10), "Clear")}))
+    engine = AlertEngine()
+    engine.prime_from_store(store, ["Oslo"])
+    fired = engine.observe_weather_data({"Oslo": payload(NOW, "Thunderstorm")})
+    assert [alert.city for alert in thunderstorm_alerts(fired)] == ["Oslo"]
+
+def test_priming_restores_windowed_rules(store, payload):
+    store.append([
+        make_history_record("Oslo", 20.0, 60, "Clear", NOW - timedelta(hours=1)),
+        make_history_record("Oslo", 11.0, 60, "Clear", NOW - timedelta(minutes=30)),
+    ])
+    engine = AlertEngine()
+    engine.prime_from_store(store, ["Oslo"])
+    # The drop already happened (and fired) before the restart; the low temperature persists
+    fired = engine.observe_weather_data({"Oslo": payload(NOW, "Clear", temperature=11.0)})
+    assert fired == []
+
+def test_prime_leaves_known_cities_alone(store, payload):
+    engine = AlertEngine()
+    engine.observe_weather_data({"Oslo": payload(NOW, "Clear")})
+    store.append(records_from_weather_data({"Oslo": payload(NOW - timedelta(hours=1), "Thunderstorm")}))
+    assert engine.prime_from_store(store, ["Oslo"]) == 0
@@ -0,0 +1,57 @@
+import threading
+
+from city_registry import CityRegistry
+
+def weather(city_id, name, country):
+    return {"id": city_id, "name": name, "sys": {"country": country}, "coord": {"lat": 1.0, "lon": 2.0}}
+
+LONDON_GB = weather(2643743, "London", "GB")
+LONDON_CA = weather(6058560, "London", "CA")
+PARIS = weather(2988507, "Paris", "FR")
+
+def test_flush_merges_registries_sharing_a_file(tmp_path):
+    path = str(tmp_path / "registry.json")
+    app, collector = CityRegistry(path=path), CityRegistry(path=path)
+    app.remember("London", LONDON_GB)
+    app.flush()
+    collector.remember("paris", PARIS)
+    collector.remember("london ontario", LONDON_CA)
+    collector.flush()
+
+    merged = CityRegistry(path=path)
+    assert merged.get("Paris") == PARIS["id"]
+    assert merged.get("London") == LONDON_GB["id"]
+    assert merged.get("London Ontario") == LONDON_CA["id"]
+    # The canonical "London, CA" label is claimed; bare "London" stays with the first binding
+    assert merged.get("London, CA") == LONDON_CA["id"]
+    assert {record.id for record in merged.records()} == {LONDON_GB["id"], LONDON_CA["id"], PARIS["id"]}
+    # The collector picked up the app's additions while merging
+    assert collector.get("London") == LONDON_GB["id"]
+
+def test_typed_alias_rebinds_across_instances(tmp_path):
+    path = str(tmp_path / "registry.json")
+    first, second = CityRegistry(path=path), CityRegistry(path=path)
+    first.remember("London", LONDON_GB)
+    first.flush()
+    # Someone explicitly typed "London" and the API answered with London, CA
+    second.remember("London", LONDON_CA)
+    second.flush()
+    assert CityRegistry(path=path).get("London") == LONDON_CA["id"]
+
+def test_concurrent_flushes_keep_every_alias(tmp_path):
+    path = str(tmp_path / "registry.json")
+    registries = [CityRegistry(path=path) for _ in range(8)]
+
+    def add(index, registry):
+        for i in range(20):
+            registry.remember(f"town {index}-{i}", weather(100_000 + index * 100 + i, f"Town {index}-{i}", "XX"))
+            registry.flush()
+
+    threads = [threading.Thread(target=add, args=pair) for pair in enumerate(registries)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    merged = CityRegistry(path=path)
+    assert all(merged.get(f"town {index}-{i}") == 100_000 + index * 100 + i for index in range(8) for i in range(20))
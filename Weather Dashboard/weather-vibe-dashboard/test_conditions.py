@@ -0,0 +1,40 @@
+import pytest
+
+from conditions import Condition, classify, classify_column
+
+@pytest.mark.parametrize("raw, expected", [
+    # OpenWeatherMap `main` groups, in any case or padding
+    ("Clear", Condition.CLEAR),
+    ("Clouds", Condition.CLOUDS),
+    ("RAIN", Condition.RAIN),
+    ("  drizzle ", Condition.DRIZZLE),
+    ("Mist", Condition.MIST),
+    ("Tornado", Condition.TORNADO),
+    # Free-text descriptions
+    ("overcast", Condition.CLOUDS),
+    ("sunny", Condition.CLEAR),
+    ("light rain", Condition.RAIN),
+    ("heavy shower snow", Condition.SNOW),
+    ("thunderstorm with light rain", Condition.THUNDERSTORM),
+    ("volcanic ash", Condition.ASH),
+    # Numeric condition ids, as ints or strings
+    (501, Condition.RAIN),
+    ("804", Condition.CLOUDS),
+    (800, Condition.CLEAR),
+    (741, Condition.FOG),
+    (212, Condition.THUNDERSTORM),
+    # Fallback
+    ("xyz", Condition.UNKNOWN),
+    ("", Condition.UNKNOWN),
+    (999, Condition.UNKNOWN),
+    (None, Condition.UNKNOWN),
+    (float("nan"), Condition.UNKNOWN),
+    (Condition.SNOW, Condition.SNOW),
+])
+def test_classify(raw, expected):
+    assert classify(raw) is expected
+
+def test_classify_column_matches_classify():
+    values = ["Rain", "light rain", None, "xyz", "Clear", "Rain"]
+    column = classify_column(values)
+    assert column.astype(str).tolist() == ["Rain", "Rain", "Unknown", "Unknown", "Clear", "Rain"]
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta
+
+from forecast import MAX_ISSUES_PER_CITY, ForecastStore
+from stub_server import fake_forecast
+
+ISSUED = datetime(2026, 1, 15, 12, 0, 0)
+
+def test_stores_in_other_processes_merge_per_city(tmp_path):
+    app, collector = ForecastStore(str(tmp_path)), ForecastStore(str(tmp_path))
+    app.add("Oslo", ISSUED, fake_forecast("Oslo"))
+    collector.add("Paris", ISSUED, fake_forecast("Paris"))
+    collector.add("Oslo", ISSUED + timedelta(hours=3), fake_forecast("Oslo"))
+
+    # Each sees what the other wrote, and neither write dropped the other's
+    assert app.issues("Oslo") == [ISSUED, ISSUED + timedelta(hours=3)]
+    assert len(app.latest("Paris")) == 40
+    assert ForecastStore(str(tmp_path)).issues("Paris") == [ISSUED]
+
+def test_keeps_only_the_newest_issues(tmp_path):
+    store = ForecastStore(str(tmp_path))
+    for cycle in range(MAX_ISSUES_PER_CITY + 2):
+        store.add("Oslo", ISSUED + timedelta(hours=3 * cycle), fake_forecast("Oslo"))
+    issues = store.issues("Oslo")
+    assert len(issues) == MAX_ISSUES_PER_CITY
+    assert issues[-1] == ISSUED + timedelta(hours=3 * (MAX_ISSUES_PER_CITY + 1))
+    # Re-adding an issue replaces its rows instead of duplicating them
+    store.add("Oslo", issues[-1], fake_forecast("Oslo"))
+    assert len(store.latest("Oslo")) == 40
+
+def test_memory_only_store():
+    store = ForecastStore(None)
+    store.add("Oslo", ISSUED, fake_forecast("Oslo"))
+    assert store.has_issue("Oslo", ISSUED)
+    assert store.latest("Paris").empty
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+from history_store import CsvHistoryBackend, make_history_record, record_observations, records_from_weather_data
+from metrics import registry
+
+def test_record_observations_writes_each_observation_once(store, payload):
+    observed = datetime(2026, 1, 15, 12, 0, 0)
+    assert record_observations(store, {"Oslo": payload(observed)}) == 1
+    assert record_observations(store, {"Oslo": payload(observed)}) == 0
+    assert record_observations(store, {"Oslo": payload(observed + timedelta(minutes=10))}) == 1
+
+def test_record_observations_after_clear(store, payload):
+    observed = datetime(2026, 1, 15, 12, 0, 0)
+    record_observations(store, {"Oslo": payload(observed)})
+    store.clear()
+    # Not newer than what was recorded before the clear, but the store no longer has it
+    assert record_observations(store, {"Oslo": payload(observed - timedelta(hours=1))}) == 1
+    assert store.count() == 1
+
+def test_record_observations_sees_rows_written_elsewhere(store, payload):
+    observed = datetime(2026, 1, 15, 12, 0, 0)
+    record_observations(store, {"Oslo": payload(observed)})
+    # Another process (the collector) stores the next observation without touching this memo
+    store.append(records_from_weather_data({"Oslo": payload(observed + timedelta(minutes=10))}))
+    assert record_observations(store, {"Oslo": payload(observed + timedelta(minutes=10))}) == 0
+    assert store.count() == 2
+
+def test_generation_changes_on_append_and_rewrite(store, payload):
+    observed = datetime(2026, 1, 15, 12, 0, 0)
+    empty = store.generation()
+    store.append(records_from_weather_data({"Oslo": payload(observed)}))
+    one_row = store.generation()
+    assert one_row != empty
+    # Same row count as before, but different rows
+    store.clear()
+    store.append(records_from_weather_data({"Oslo": payload(observed + timedelta(hours=1))}))
+    assert store.generation() != one_row
+
+def test_csv_refresh_resumes_after_partial_trailing_row(tmp_path):
+    path = tmp_path / "history.csv"
+    path.write_text(
+        "timestamp,city,temperature_c,humidity,condition\n"
+        "2026-01-15 12:00:00,Oslo,1.0,70,Clear\n"
+        "2026-01-15 12:10:00,Oslo,2.0,70,Clear\n"
+        "2026-01-15 12:20:00,Os"
+    )
+    store = CsvHistoryBackend(str(path))
+    assert store.count() == 2
+    read_before = registry.snapshot()[0].get("history_rows_read", 0)
+
+    with open(path, "a") as f:
+        f.write("lo,3.0,70,Clear\n2026-01-15 12:30:00,Oslo,4.0,70,Clear\n")
+    history = store.load_all()
+
+    assert history['temperature_c'].tolist() == [1.0, 2.0, 3.0, 4.0]
+    # Only the completed row and the new one are parsed, not the whole file again
+    assert registry.snapshot()[0]["history_rows_read"] - read_before == 2
+
+def test_distinct_cities_follow_appends_and_clear(store):
+    now = datetime.now().replace(microsecond=0)
+    store.append([make_history_record("Oslo", 5.0, 70, "Clouds", now)])
+    assert store.distinct_cities() == ["Oslo"]
+    store.append([make_history_record("Bergen", 7.0, 80, "Rain", now)])
+    assert store.distinct_cities() == ["Bergen", "Oslo"]
+    store.clear()
+    assert store.distinct_cities() == []
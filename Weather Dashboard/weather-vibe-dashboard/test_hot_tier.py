@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta
+
+from history_store import CsvHistoryBackend, make_history_record
+from hot_tier import HotTier
+
+def test_sync_drops_samples_cleared_by_another_instance(backend, tmp_path):
+    path = str(tmp_path / "history")
+    store, other = backend(path), backend(path)
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=2)
+    store.append([make_history_record("Oslo", 10.0 + i, 70, "Clouds", start + timedelta(minutes=10 * i)) for i in range(6)])
+    hot = HotTier()
+    hot.sync(store)
+    assert len(hot.latest("Oslo", 6)) == 6
+
+    # Cleared elsewhere (another session's instance, or the collector), then one new row
+    other.clear()
+    other.append([make_history_record("Oslo", 3.0, 70, "Clear", start + timedelta(hours=1, minutes=30))])
+    hot.sync(store)
+
+    assert hot.latest("Oslo", 7) is None
+    assert hot.latest("Oslo", 1)['temperature_c'].tolist() == [3.0]
+
+def test_latest_keeps_stored_condition_text(tmp_path):
+    store = CsvHistoryBackend(str(tmp_path / "history.csv"))
+    now = datetime.now().replace(microsecond=0)
+    store.append([make_history_record("Oslo", 5.0, 90, "Light Rain", now - timedelta(minutes=5))])
+    hot = HotTier()
+    hot.sync(store)
+    frame = hot.latest("Oslo", 1)
+    assert frame['condition'].tolist() == ["Light Rain"]
+    assert frame['condition_group'].astype(str).tolist() == ["Rain"]
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from map_clusters import MAX_LEVEL, cluster_cities
+
+CITIES = pd.DataFrame(
+    {
+        'lat': [59.91, 60.39, 40.71, -33.87],
+        'lon': [10.75, 5.32, -74.01, 151.21],
+        'condition_group': ["Rain", "Rain", "Clear", "Clouds"],
+        'temperature': [4.0, 6.0, 20.0, 25.0],
+    },
+    index=["Oslo", "Bergen", "New York", "Sydney"],
+)
+
+def centroid(*cities):
+    members = CITIES.loc[list(cities)]
+    return (len(members), round(members['lat'].mean(), 4), round(members['lon'].mean(), 4))
+
+def summary(clusters):
+    return sorted((int(row.count), round(row.lat, 4), round(row.lon, 4)) for row in clusters.itertuples())
+
+@pytest.mark.parametrize("level, groups", [
+    # One 360-degree cell holds the whole globe
+    (0, [("Oslo", "Bergen", "New York", "Sydney")]),
+    # 180-degree cells split west from east of Greenwich
+    (1, [("New York",), ("Oslo", "Bergen", "Sydney")]),
+    # 90-degree cells also split the hemispheres; Norway stays together
+    (2, [("New York",), ("Oslo", "Bergen"), ("Sydney",)]),
+    (MAX_LEVEL, [("New York",), ("Oslo",), ("Bergen",), ("Sydney",)]),
+])
+def test_cluster_counts_and_centroids_per_level(level, groups):
+    clusters, used = cluster_cities(CITIES, level=level)
+    assert used == level
+    assert summary(clusters) == sorted(centroid(*group) for group in groups)
+
+def test_cluster_takes_dominant_condition_and_bounds():
+    clusters, _ = cluster_cities(CITIES, level=2)
+    norway = clusters[clusters['count'] == 2].iloc[0]
+    assert norway['condition'] == "Rain"
+    assert norway['temperature'] == 5.0
+    assert (norway['lat_min'], norway['lat_max'], norway['lon_min'], norway['lon_max']) == (59.91, 60.39, 5.32, 10.75)
+    assert norway['label'] == "Oslo, Bergen"
+
+def test_level_coarsened_to_marker_budget():
+    clusters, level = cluster_cities(CITIES, level=MAX_LEVEL, max_markers=2)
+    assert level == 1
+    assert len(clusters) == 2
+
+def test_bounds_recluster_one_region():
+    clusters, level = cluster_cities(CITIES, bounds=(59.91, 60.39, 5.32, 10.75))
+    assert level == MAX_LEVEL
+    assert summary(clusters) == sorted([centroid("Oslo"), centroid("Bergen")])
@@ -0,0 +1,34 @@
+import os
+import subprocess
+import sys
+import threading
+
+import metrics
+
+def test_metrics_file_written_concurrently(tmp_path):
+    path = str(tmp_path / "weather.prom")
+    errors = []
+
+    def write_repeatedly():
+        try:
+            for _ in range(50):
+                metrics.write_metrics_file(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write_repeatedly) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+def test_render_log_emitted_when_enabled():
+    script = "import metrics; metrics.finish_render(metrics.start_render())"
+    env = {**os.environ, "WEATHER_METRICS_LOG": "info"}
+    result = subprocess.run(
+        [sys.executable, "-c", script], env=env, cwd=os.path.dirname(os.path.abspath(metrics.__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    assert '"event": "render"' in result.stderr
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from history_stats import DailyStatsCache
+from history_store import make_history_record
+from retention import RetentionTier, compact
+from trends import RollupCache, downsample, load_trend, lttb_indices
+
+NOW = datetime(2026, 1, 15, 12, 0, 0)
+POLICY = [
+    RetentionTier("raw", None, timedelta(days=2)),
+    RetentionTier("hourly", "60min", None),
+]
+
+def observations(city, start, count, step=timedelta(minutes=30)):
+    return [
+        make_history_record(city, 10.0 + i % 5, 70, "Clouds", start + i * step)
+        for i in range(count)
+    ]
+
+def test_rollup_cache_rebuilds_after_compaction_then_appends(store):
+    store.append(observations("Oslo", NOW - timedelta(days=5), 48))
+    cache = RollupCache(store)
+    assert cache.get("Oslo", "60min")['samples'].sum() == 48
+
+    assert compact(store, POLICY, now=NOW)["raw"] == 48
+    # More rows than were compacted away, so the row count alone looks like growth
+    store.append(observations("Oslo", NOW - timedelta(days=1), 60))
+
+    assert cache.get("Oslo", "60min")['samples'].sum() == 60
+    frame, is_rollup = load_trend(store, "Oslo", "30-Day")
+    assert is_rollup
+    assert frame['samples'].sum() == 108
+
+def test_rollup_cache_extends_incrementally_on_append(store):
+    store.append(observations("Oslo", NOW - timedelta(days=1), 10))
+    cache = RollupCache(store)
+    cache.get("Oslo", "60min")
+    store.append(observations("Oslo", NOW - timedelta(days=1) + timedelta(hours=5), 10))
+    assert cache.get("Oslo", "60min")['samples'].sum() == 20
+
+def test_daily_stats_rebuild_after_compaction_then_appends(store):
+    store.append(observations("Oslo", NOW - timedelta(days=5), 48))
+    cache = DailyStatsCache(store)
+    assert cache.get()['samples'].sum() == 48
+
+    compact(store, POLICY, now=NOW)
+    store.append(observations("Oslo", NOW - timedelta(days=1), 60))
+
+    daily = cache.get()
+    assert daily['samples'].sum() == 108
+    assert not daily.duplicated(['city', 'timestamp']).any()
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (101, 3), (50, 49), (500, 500), (10, 2)])
+def test_lttb_keeps_endpoints_and_point_budget(n, threshold):
+    x = np.arange(n)
+    y = np.sin(x / 7.0) * 10 + x % 3
+    indices = lttb_indices(x, y, threshold)
+
+    expected = threshold if 3 <= threshold < n else n
+    assert len(indices) == expected
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+
+def test_lttb_keeps_spike():
+    y = np.zeros(1000)
+    y[537] = 50.0
+    assert 537 in lttb_indices(np.arange(1000), y, 20)
+
+def test_downsample_frame_within_budget():
+    index = pd.date_range(NOW, periods=2000, freq="min")
+    frame = pd.DataFrame({'temperature_c': np.cos(np.arange(2000) / 30.0)}, index=index)
+    reduced = downsample(frame, 'temperature_c', threshold=250)
+    assert len(reduced) == 250
+    assert reduced.index[0] == index[0] and reduced.index[-1] == index[-1]
+    assert downsample(frame, 'temperature_c', threshold=5000) is frame
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import weather_api
+from city_registry import CityRegistry
+from stub_server import StubHandler, start_stub_server
+from weather_api import CircuitBreaker, CircuitOpenError, api_get, fetch_weather_batch
+
+class FailingSession:
+    """Session stand-in whose every GET raises `error`."""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        raise self.error
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+@pytest.fixture
+def half_open_breaker(monkeypatch):
+    """A breaker that has tripped and whose cool-down has already elapsed."""
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.failures = 1
+    breaker.opened_at = time.monotonic() - 1
+    monkeypatch.setattr(weather_api, "breaker", breaker)
+    return breaker
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.TooManyRedirects("redirect loop"),
+    requests.exceptions.ChunkedEncodingError("truncated body"),
+    ValueError("bad payload"),
+])
+def test_half_open_trial_released_on_unexpected_error(half_open_breaker, error):
+    session = FailingSession(error)
+    with pytest.raises(type(error)):
+        api_get("http://stub/weather", {}, session=session)
+    assert session.calls == 1
+    # The failed trial must not leave the breaker shut for good
+    half_open_breaker.before_request()
+
+def test_half_open_admits_one_trial(half_open_breaker):
+    half_open_breaker.before_request()
+    with pytest.raises(CircuitOpenError):
+        half_open_breaker.before_request()
+
+@pytest.mark.parametrize("retry_after", ["-5", "Wed, 21 Oct 2015 07:28:00 GMT"])
+def test_retry_delay_never_negative(retry_after):
+    assert weather_api._retry_delay(0, FakeResponse({"Retry-After": retry_after})) == 0.0
+
+def test_response_cache_flushes_concurrently(tmp_path):
+    cache = weather_api.ResponseCache(path=str(tmp_path / "cache.json"))
+    errors = []
+
+    def flush_repeatedly(worker):
+        try:
+            for i in range(50):
+                cache.set(f"city-{worker}-{i}", {"i": i})
+                cache.flush()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=flush_repeatedly, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert weather_api.ResponseCache(path=cache.path).stats()["size"] == cache.max_entries
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server, base_url = start_stub_server()
+    yield base_url
+    server.shutdown()
+
+@pytest.fixture
+def stub_api(stub_url, monkeypatch):
+    """Point the client at the stub with an empty registry, cache and breaker."""
+    for name in ("API_BASE_URL", "API_URL", "GROUP_URL", "FORECAST_URL"):
+        monkeypatch.setattr(weather_api, name, getattr(weather_api, name))
+    weather_api.set_base_url(stub_url)
+    monkeypatch.setattr(weather_api, "city_ids", CityRegistry())
+    monkeypatch.setattr(weather_api, "response_cache", weather_api.ResponseCache())
+    monkeypatch.setattr(weather_api, "breaker", CircuitBreaker())
+
+def requests_made(fn):
+    before = StubHandler.request_count
+    result = fn()
+    return result, StubHandler.request_count - before
+
+def test_group_mode_batches_known_ids(stub_api):
+    cities = [f"City {i}" for i in range(25)]
+    # Resolve every name once so the group request can use ids
+    (first, _), count = requests_made(lambda: fetch_weather_batch("k", cities, mode="city"))
+    assert count == 25
+
+    (weather_data, errors), count = requests_made(
+        lambda: fetch_weather_batch("k", cities, mode="group", use_cache=False)
+    )
+    assert count == 2  # GROUP_LIMIT=20 ids, then the remaining 5
+    assert errors == {}
+    assert list(weather_data) == cities
+    assert [weather_data[city]["id"] for city in cities] == [first[city]["id"] for city in cities]
+
+def test_group_mode_falls_back_per_city_and_reports_404(stub_api):
+    fetch_weather_batch("k", ["Oslo", "Bergen"], mode="city")
+
+    (weather_data, errors), count = requests_made(
+        lambda: fetch_weather_batch("k", ["Oslo", "Nowhere Town", "Bergen", "Tromso"], mode="group", use_cache=False)
+    )
+    # One /group request for the known ids, one /weather?q= per unknown name
+    assert count == 3
+    assert list(weather_data) == ["Oslo", "Bergen", "Tromso"]
+    assert errors == {"Nowhere Town": "❌ City 'Nowhere Town' not found"}
+    # The new city is resolved now and joins the group next time; the missing one is not
+    assert weather_api.city_ids.get("Tromso") == weather_data["Tromso"]["id"]
+    assert weather_api.city_ids.get("Nowhere Town") is None
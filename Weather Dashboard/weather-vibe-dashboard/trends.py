@@ -0,0 +1,211 @@
+import threading
+from datetime import timedelta
+
+from conditions import classify_column
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ============================================
+# TREND WINDOWS & DOWNSAMPLING
+# ============================================
+# label -> (window length, rollup frequency); None means raw samples
+TREND_WINDOWS = {
+    "7-Day": (timedelta(days=7), None),
+    "30-Day": (timedelta(days=30), "60min"),
+    "1-Year": (timedelta(days=365), "D"),
+}
+# Upper bound on points sent to the browser per trace
+POINT_BUDGET = 500
+ROLLUP_FIELDS = ['temperature_c', 'humidity']
+ROLLUP_COLUMNS = [f"{field}_{stat}" for field in ROLLUP_FIELDS for stat in ("min", "mean", "max")] + ['samples']
+
+def rollup(history, freq):
+    """Bucket history into min/mean/max per `freq` (e.g. "60min", "D").
+
+    Returns a frame indexed by bucket start with columns like
+    temperature_c_min, temperature_c_mean, temperature_c_max, plus the
+    number of samples in each bucket.
+    """
+    if history.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS, index=pd.DatetimeIndex([]))
+    series = history.set_index('timestamp')[ROLLUP_FIELDS].astype("float64").sort_index()
+    resampled = series.resample(freq)
+    buckets = resampled.agg(['min', 'mean', 'max'])
+    buckets.columns = [f"{field}_{stat}" for field, stat in buckets.columns]
+    buckets['samples'] = resampled.size()
+    return buckets[buckets['samples'] > 0]
+
+def rollup_by_city(history, freq):
+    """Flat rollups for many cities: one row per (city, bucket) with timestamp and city columns."""
+    if history.empty:
+        return pd.DataFrame(columns=['timestamp', 'city'] + ROLLUP_COLUMNS)
+    frame = history.dropna(subset=['timestamp'])
+    grouped = frame[ROLLUP_FIELDS].astype("float64").groupby(
+        [frame['city'].astype(str).to_numpy(), frame['timestamp'].dt.floor(freq).rename('timestamp')]
+    )
+    buckets = grouped.agg(['min', 'mean', 'max'])
+    buckets.columns = [f"{field}_{stat}" for field, stat in buckets.columns]
+    buckets['samples'] = grouped.size()
+    return buckets.rename_axis(['city', 'timestamp']).reset_index()[['timestamp', 'city'] + ROLLUP_COLUMNS]
+
+def combine_rollups(rollups, freq):
+    """Merge flat rollup rows into `freq` buckets (same or coarser than theirs).
+
+    Used both to fold partial results for the same bucket together and to
+    coarsen hourly rollups into daily ones; means are weighted by samples.
+    """
+    if rollups.empty:
+        return pd.DataFrame(columns=['timestamp', 'city'] + ROLLUP_COLUMNS)
+    frame = rollups.copy()
+    frame['timestamp'] = frame['timestamp'].dt.floor(freq)
+    aggregations = {'samples': 'sum'}
+    for field in ROLLUP_FIELDS:
+        frame[f"{field}_sum"] = frame[f"{field}_mean"] * frame['samples']
+        aggregations.update({f"{field}_min": 'min', f"{field}_max": 'max', f"{field}_sum": 'sum'})
+    buckets = frame.groupby(['city', 'timestamp'], observed=True).agg(aggregations)
+    for field in ROLLUP_FIELDS:
+        buckets[f"{field}_mean"] = buckets.pop(f"{field}_sum") / buckets['samples']
+    return buckets.reset_index()[['timestamp', 'city'] + ROLLUP_COLUMNS]
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the shape of y(x)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    edges = np.floor(np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(int) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the final point) is the third triangle vertex
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.nanargmax(areas)) if np.isfinite(areas).any() else start
+        selected[i + 1] = a
+    return selected
+
+def downsample(frame, value_column, threshold=POINT_BUDGET):
+    """Reduce a time-indexed frame to at most `threshold` rows using LTTB on one column."""
+    if len(frame) <= threshold:
+        return frame
+    x = frame.index.values.astype("datetime64[ns]").astype("int64")
+    return frame.iloc[lttb_indices(x, frame[value_column].to_numpy(), threshold)]
+
+# ============================================
+# INCREMENTAL ROLLUPS
+# ============================================
+class RollupCache:
+    """Per-city rollups kept up to date incrementally from a history store.
+
+    When the store changes only the rows from the last (possibly partial)
+    bucket onwards are re-read and re-aggregated. If rows were removed or
+    rewritten (cleared or compacted, see store.epoch()) the rollup is
+    rebuilt from scratch.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._rollups = {}
+        self._lock = threading.Lock()
+
+    def get(self, city, freq):
+        key = (city, freq)
+        generation = self.store.generation()
+        epoch = self.store.epoch()
+        with self._lock:
+            cached = self._rollups.get(key)
+            if cached and cached['generation'] == generation and cached['epoch'] == epoch:
+                return cached['frame']
+
+            if cached and cached['epoch'] == epoch and not cached['frame'].empty:
+                # Re-aggregate from the start of the newest bucket; older buckets are final
+                last_bucket = cached['frame'].index[-1]
+                fresh = rollup(self.store.range(city, last_bucket, pd.Timestamp.max), freq)
+                frame = pd.concat([cached['frame'][cached['frame'].index < last_bucket], fresh])
+            else:
+                frame = rollup(self.store.range(city, pd.Timestamp.min, pd.Timestamp.max), freq)
+
+            self._rollups[key] = {'generation': generation, 'epoch': epoch, 'frame': frame}
+            return frame
+
+_rollup_caches = {}
+_rollup_caches_lock = threading.Lock()
+
+def get_rollup_cache(store):
+    """Return the shared RollupCache for a history store."""
+    with _rollup_caches_lock:
+        cache = _rollup_caches.get(id(store))
+        if cache is None or cache.store is not store:
+            cache = RollupCache(store)
+            _rollup_caches[id(store)] = cache
+        return cache
+
+def load_trend(store, city, window_label, hot=None):
+    """Return (frame, is_rollup) for a city over one of TREND_WINDOWS.
+
+    The window ends at the city's latest observation so the chart stays
+    populated even if collection has paused. Raw frames are indexed by
+    timestamp and carry a categorical condition_group; rollup frames are
+    indexed by bucket start. Both are capped at POINT_BUDGET rows. Raw
+    windows are served from the in-memory `hot` tier when it covers them.
+    """
+    window, freq = TREND_WINDOWS[window_label]
+    end = hot.last_timestamp(city) if hot is not None else None
+    if end is None:
+        latest = store.latest_n(city, 1)
+        if latest.empty or pd.isna(latest['timestamp'].iloc[-1]):
+            return pd.DataFrame(), freq is not None
+        end = latest['timestamp'].iloc[-1]
+    start = end - window
+
+    if freq is None:
+        frame = hot.since(city, start) if hot is not None else None
+        if frame is not None:
+            return downsample(frame.set_index('timestamp'), 'temperature_c'), False
+        frame = store.range(city, start, end).set_index('timestamp').sort_index()
+        # Free-text history conditions ("Light Rain", "Overcast") mapped to canonical groups
+        frame['condition_group'] = classify_column(frame['condition'])
+        return downsample(frame, 'temperature_c'), False
+
+    buckets = get_rollup_cache(store).get(city, freq)
+    archived = archived_rollups(store, city, freq)
+    if not archived.empty:
+        # Older buckets were compacted out of raw history by the retention job
+        recent = buckets.rename_axis('timestamp').reset_index().assign(city=city)
+        merged = combine_rollups(pd.concat([archived, recent], ignore_index=True), freq)
+        buckets = merged.drop(columns='city').set_index('timestamp').sort_index()
+    frame = buckets[buckets.index >= start.floor(freq)]
+    return downsample(frame, 'temperature_c_mean'), True
+
+def archived_rollups(store, city, freq):
+    """Compacted rollup rows for one city from every retention tier, as flat rows."""
+    from retention import RETENTION_POLICY
+
+    frames = []
+    for tier in RETENTION_POLICY:
+        if tier.freq is None:
+            continue
+        rows = store.read_tier(tier.name)
+        if not rows.empty:
+            frames.append(rows[rows['city'] == city])
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
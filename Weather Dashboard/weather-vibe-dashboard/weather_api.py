@@ -0,0 +1,432 @@
+import requests
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+
+from city_registry import city_registry as city_ids
+from history_store import file_lock
+from metrics import bind_render, increment
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# ============================================
+# OPENWEATHERMAP CLIENT
+# ============================================
+API_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5").rstrip("/")
+API_URL = f"{API_BASE_URL}/weather"
+GROUP_URL = f"{API_BASE_URL}/group"
+FORECAST_URL = f"{API_BASE_URL}/forecast"
+REQUEST_TIMEOUT = 5
+MAX_WORKERS = 8
+
+# "city" fetches one city per request; "group" batches cities with a known
+# OpenWeatherMap id into /group calls of up to GROUP_LIMIT ids each
+FETCH_MODE = os.getenv("WEATHER_FETCH_MODE", "city")
+GROUP_LIMIT = 20
+
+# OpenWeatherMap refreshes current conditions roughly every 10 minutes
+CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "600"))
+CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_SIZE", "256"))
+CACHE_FILE = os.getenv("WEATHER_CACHE_FILE") or None
+
+# Retries for 429/5xx and connection failures, with capped exponential backoff
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 4.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# After this many consecutive upstream failures, fail fast for a cool-down period
+BREAKER_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30
+
+def _build_session(pool_size=MAX_WORKERS):
+    """Session with a keep-alive pool large enough for every fetch worker."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+_session = _build_session()
+
+def set_base_url(base_url):
+    """Point the client at another API root, e.g. a local stub server."""
+    global API_BASE_URL, API_URL, GROUP_URL, FORECAST_URL
+    API_BASE_URL = base_url.rstrip("/")
+    API_URL = f"{API_BASE_URL}/weather"
+    GROUP_URL = f"{API_BASE_URL}/group"
+    FORECAST_URL = f"{API_BASE_URL}/forecast"
+
+# ============================================
+# CIRCUIT BREAKER
+# ============================================
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is known to be down."""
+
+class CircuitBreaker:
+    """Stop calling the API after repeated failures, then let one trial request through."""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0 or self._trial_in_flight:
+                raise CircuitOpenError(max(0, int(remaining)))
+            # Half-open: let exactly one request test the upstream
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+breaker = CircuitBreaker()
+
+def _retry_delay(attempt, response=None):
+    """Seconds to wait before the next attempt, honouring Retry-After when present."""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    # Full jitter keeps concurrent workers from retrying in lockstep
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def api_get(url, params, session=None):
+    """GET with retries, backoff and the shared circuit breaker.
+
+    Returns the final response (which may still be an error status) or
+    raises requests exceptions / CircuitOpenError.
+    """
+    session = session or _session
+    for attempt in range(MAX_RETRIES + 1):
+        breaker.before_request()
+        try:
+            increment("api_calls")
+            response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            increment("api_bytes_received", len(response.content))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            breaker.record_failure()
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(attempt))
+            continue
+        except Exception:
+            # Any other failure still ends a half-open trial, or the breaker would never close
+            breaker.record_failure()
+            raise
+
+        # A 429 means the upstream is healthy, just throttling us
+        if response.status_code in RETRY_STATUSES and response.status_code != 429:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if response.status_code not in RETRY_STATUSES:
+            return response
+
+        delay = _retry_delay(attempt, response)
+        # Don't hold a render hostage to a long Retry-After; surface the error instead
+        if attempt == MAX_RETRIES or delay > BACKOFF_MAX:
+            return response
+        time.sleep(delay)
+
+# ============================================
+# RESPONSE CACHE
+# ============================================
+class ResponseCache:
+    """Thread-safe TTL + LRU cache for API payloads, optionally backed by a JSON file."""
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, path=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    @staticmethod
+    def make_key(city, units, api_key):
+        """Build a cache key without keeping the raw API key around."""
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return f"{city.strip().lower()}|{units}|{key_hash}"
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                    self._dirty = True
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, data):
+        with self._lock:
+            self._entries[key] = (time.time(), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def flush(self):
+        """Write entries to disk if a backing file is configured."""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = [[key, stored_at, data] for key, (stored_at, data) in self._entries.items()]
+            self._dirty = False
+        # Sessions and processes flush concurrently: each writes its own temp file
+        # and the renames are serialised, so none can move another's file away
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with file_lock(f"{self.path}.lock"):
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, stored_at, data in snapshot[-self.max_entries:]:
+            if now - stored_at <= self.ttl:
+                self._entries[key] = (stored_at, data)
+
+response_cache = ResponseCache(path=CACHE_FILE)
+
+# ============================================
+# SINGLE-FLIGHT REQUESTS
+# ============================================
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    Streamlit runs every browser session in its own thread of the same
+    process, so sessions asking for the same city at the same time share
+    one upstream request instead of each making their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, default=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": default}
+                self._calls[key] = call
+
+        if not leader:
+            call["done"].wait()
+            increment("singleflight_shared")
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+        return call["result"]
+
+inflight = SingleFlight()
+
+def _get_json(url, params, city, session=None):
+    """GET a per-city endpoint; returns (data, error) with a user-facing error message."""
+    response = None
+    try:
+        response = api_get(url, params, session)
+        response.raise_for_status()
+        return response.json(), None
+    except CircuitOpenError as e:
+        return None, f"❌ OpenWeatherMap is unavailable, retrying in {e.args[0]}s"
+    except requests.exceptions.ConnectionError:
+        return None, "❌ Network error: Unable to connect to OpenWeatherMap API"
+    except requests.exceptions.Timeout:
+        return None, "❌ Network error: OpenWeatherMap API timed out"
+    except requests.exceptions.HTTPError:
+        if response.status_code == 401:
+            return None, "❌ Invalid API Key"
+        elif response.status_code == 404:
+            return None, f"❌ City '{city}' not found"
+        elif response.status_code == 429:
+            return None, "❌ API rate limit reached, please try again shortly"
+        return None, f"❌ API Error: {response.status_code}"
+    except Exception as e:
+        return None, f"❌ Error: {str(e)}"
+
+def request_weather(api_key, city, session=None, units="metric"):
+    """Fetch current weather for one city.
+
+    Returns a (data, error) tuple so callers can report failures without
+    touching Streamlit from a worker thread.
+    """
+    # Once a name has been resolved, fetch by id so it always means the same city
+    city_id = city_ids.get(city)
+    query = {"id": city_id} if city_id else {"q": city}
+    data, error = _get_json(API_URL, {**query, "appid": api_key, "units": units}, city, session)
+    if data:
+        city_ids.remember(city, data)
+    return data, error
+
+def request_forecast(api_key, city, session=None, units="metric"):
+    """Fetch the 5-day, 3-hourly forecast for one city as a (data, error) tuple."""
+    city_id = city_ids.get(city)
+    query = {"id": city_id} if city_id else {"q": city}
+    return _get_json(FORECAST_URL, {**query, "appid": api_key, "units": units}, city, session)
+
+def request_weather_group(api_key, ids, session=None, units="metric"):
+    """Fetch up to GROUP_LIMIT cities by id in one request.
+
+    Returns (payloads_by_id, error).
+    """
+    try:
+        response = api_get(
+            GROUP_URL,
+            {"id": ",".join(str(city_id) for city_id in ids), "appid": api_key, "units": units},
+            session
+        )
+        response.raise_for_status()
+        return {item["id"]: item for item in response.json().get("list", [])}, None
+    except Exception as e:
+        return {}, f"❌ Group request failed: {str(e)}"
+
+def _fetch_by_group(api_key, cities, units, max_workers):
+    """Fetch every city with a known id through /group; returns {city: payload}."""
+    cities_by_id = {}
+    for city in cities:
+        city_id = city_ids.get(city)
+        if city_id:
+            cities_by_id.setdefault(city_id, []).append(city)
+    ids = list(cities_by_id)
+    chunks = [ids[i:i + GROUP_LIMIT] for i in range(0, len(ids), GROUP_LIMIT)]
+    if not chunks:
+        return {}
+
+    workers = max(1, min(max_workers, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(bind_render(lambda chunk: inflight.do(
+            ResponseCache.make_key(f"group:{','.join(map(str, chunk))}", units, api_key),
+            lambda: request_weather_group(api_key, chunk, units=units),
+            default=({}, "❌ Group request failed")
+        )), chunks))
+
+    fetched = {}
+    for payloads, _ in results:
+        for city_id, data in payloads.items():
+            for city in cities_by_id.get(city_id, []):
+                fetched[city] = data
+    return fetched
+
+def _request_shared(api_key, city, units):
+    """Fetch one city through the single-flight group and store the result in the cache."""
+    key = ResponseCache.make_key(city, units, api_key)
+
+    def fetch():
+        data, error = request_weather(api_key, city, units=units)
+        if data:
+            response_cache.set(key, data)
+        return data, error
+
+    return inflight.do(key, fetch, default=(None, "❌ Error: request failed"))
+
+def fetch_weather_cached(api_key, city, units="metric", use_cache=True):
+    """Fetch one city, serving from the response cache while it is fresh."""
+    if use_cache:
+        data = response_cache.get(ResponseCache.make_key(city, units, api_key))
+        if data is not None:
+            return data, None
+    return _request_shared(api_key, city, units)
+
+def fetch_weather_batch(api_key, cities, max_workers=MAX_WORKERS, units="metric", use_cache=True, mode=None):
+    """Fetch several cities concurrently over the shared session.
+
+    Returns (weather_data, errors): weather_data maps city -> payload in the
+    order the cities were given, errors maps city -> message. Pass
+    use_cache=False to bypass cached responses (they are still refreshed).
+    In "group" mode, cities with a known id are fetched through /group and
+    the rest fall back to one request per city.
+    """
+    cities = list(dict.fromkeys(cities))
+    if not cities:
+        return {}, {}
+    mode = mode or FETCH_MODE
+
+    weather_data = {}
+    errors = {}
+    pending = []
+    for city in cities:
+        data = response_cache.get(ResponseCache.make_key(city, units, api_key)) if use_cache else None
+        if data is not None:
+            weather_data[city] = data
+        else:
+            pending.append(city)
+
+    if mode == "group" and pending:
+        for city, data in _fetch_by_group(api_key, pending, units, max_workers).items():
+            weather_data[city] = data
+            response_cache.set(ResponseCache.make_key(city, units, api_key), data)
+        pending = [city for city in pending if city not in weather_data]
+
+    if pending:
+        workers = max(1, min(max_workers, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(bind_render(lambda city: _request_shared(api_key, city, units)), pending))
+        for city, (data, error) in zip(pending, results):
+            if data:
+                weather_data[city] = data
+            elif error:
+                errors[city] = error
+
+    response_cache.flush()
+    city_ids.flush()
+    return {city: weather_data[city] for city in cities if city in weather_data}, errors
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+from conditions import classify_column
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# ============================================
+# COLUMNAR CURRENT CONDITIONS
+# ============================================
+# Columns holding absolute temperatures in °C; projected to the display unit with an offset
+TEMPERATURE_COLUMNS = ['temperature_c', 'feels_like_c', 'dew_point_c', 'heat_index_c', 'wind_chill_c']
+# Columns holding temperature differences in °C; projected without the offset
+DELTA_COLUMNS = ['temp_delta_24h_c']
+# How far a past observation may sit from "24h ago" and still count for the daily delta
+DELTA_TOLERANCE = timedelta(hours=3)
+
+def build_weather_frame(weather_data):
+    """Normalise API payloads into one city-indexed frame of current conditions (metric units)."""
+    payloads = list(weather_data.values())
+    frame = pd.DataFrame({
+        'city_id': [data.get('id') for data in payloads],
+        # Local wall-clock time, matching how history rows are stamped
+        'observed_at': pd.to_datetime([
+            datetime.fromtimestamp(data['dt']) if data.get('dt') else pd.NaT for data in payloads
+        ]),
+        'temperature_c': [data['main']['temp'] for data in payloads],
+        'feels_like_c': [data['main']['feels_like'] for data in payloads],
+        'humidity': [data['main']['humidity'] for data in payloads],
+        'pressure': [data['main']['pressure'] for data in payloads],
+        'wind_speed': [data['wind']['speed'] for data in payloads],
+        'condition': [data['weather'][0]['main'] for data in payloads],
+        # Numeric OWM ids classify unambiguously; fall back to the text group
+        'condition_group': classify_column([
+            data['weather'][0].get('id') or data['weather'][0]['main'] for data in payloads
+        ]).to_numpy(),
+        'lat': [data.get('coord', {}).get('lat') for data in payloads],
+        'lon': [data.get('coord', {}).get('lon') for data in payloads],
+    }, index=pd.Index(list(weather_data), name='city'))
+    for column in ['temperature_c', 'feels_like_c', 'humidity', 'pressure', 'wind_speed', 'lat', 'lon']:
+        frame[column] = frame[column].astype('float64')
+    return add_derived_metrics(frame)
+
+def dew_point(temp_c, humidity):
+    """Magnus-formula dew point in °C."""
+    a, b = 17.62, 243.12
+    gamma = np.log(np.clip(humidity, 1, 100) / 100) + a * temp_c / (b + temp_c)
+    return b * gamma / (a - gamma)
+
+def heat_index(temp_c, humidity):
+    """NOAA (Rothfusz) heat index in °C; equals the air temperature below 80°F."""
+    t = temp_c * 9 / 5 + 32
+    rh = humidity
+    hi = (-42.379 + 2.04901523 * t + 10.14333127 * rh - 0.22475541 * t * rh
+          - 0.00683783 * t ** 2 - 0.05481717 * rh ** 2 + 0.00122874 * t ** 2 * rh
+          + 0.00085282 * t * rh ** 2 - 0.00000199 * t ** 2 * rh ** 2)
+    return np.where(t >= 80, (hi - 32) * 5 / 9, temp_c)
+
+def wind_chill(temp_c, wind_speed):
+    """Environment Canada wind chill in °C; equals the air temperature outside its valid range."""
+    v = np.power(wind_speed * 3.6, 0.16)
+    chill = 13.12 + 0.6215 * temp_c - 11.37 * v + 0.3965 * temp_c * v
+    return np.where((temp_c <= 10) & (wind_speed * 3.6 > 4.8), chill, temp_c)
+
+def add_derived_metrics(frame):
+    """Add dew point, heat index and wind chill columns in one vectorised pass."""
+    temp = frame['temperature_c'].to_numpy()
+    humidity = frame['humidity'].to_numpy()
+    frame['dew_point_c'] = dew_point(temp, humidity)
+    frame['heat_index_c'] = heat_index(temp, humidity)
+    frame['wind_chill_c'] = wind_chill(temp, frame['wind_speed'].to_numpy())
+    frame['temp_delta_24h_c'] = np.nan
+    return frame
+
+def add_daily_deltas(frame, history):
+    """Fill temp_delta_24h_c with the change since the observation nearest 24h earlier.
+
+    `history` needs city, timestamp and temperature_c columns; cities without
+    a sample within DELTA_TOLERANCE of that point keep NaN.
+    """
+    frame = frame.copy()
+    if history.empty or frame.empty:
+        return frame
+    targets = pd.DataFrame({
+        'city': frame.index.astype(str),
+        'target': (frame['observed_at'].fillna(pd.Timestamp.now()) - pd.Timedelta(days=1)).to_numpy(),
+        'row': np.arange(len(frame)),
+    }).sort_values('target')
+    past = pd.DataFrame({
+        'city': history['city'].astype(str).to_numpy(),
+        'target': pd.to_datetime(history['timestamp']).to_numpy(),
+        'past_temp': history['temperature_c'].astype('float64').to_numpy(),
+    }).dropna(subset=['target']).sort_values('target')
+    matched = pd.merge_asof(
+        targets, past, on='target', by='city', direction='nearest', tolerance=DELTA_TOLERANCE
+    ).sort_values('row')
+    frame['temp_delta_24h_c'] = frame['temperature_c'].to_numpy() - matched['past_temp'].to_numpy()
+    return frame
+
+def in_unit(frame, unit):
+    """Project the °C columns of a weather frame to `unit` ('C' or 'F').
+
+    Returned columns drop the `_c` suffix (temperature, feels_like, ...).
+    """
+    projected = frame.copy()
+    scale, offset = (9 / 5, 32) if unit == 'F' else (1, 0)
+    for column in TEMPERATURE_COLUMNS:
+        projected[column] = frame[column] * scale + offset
+    for column in DELTA_COLUMNS:
+        projected[column] = frame[column] * scale
+    return projected.rename(columns=lambda column: column[:-2] if column.endswith('_c') else column)